@@ -0,0 +1,70 @@
+"""
+Measures the start-up cost of the transpiler modules.
+
+Every measurement runs in a fresh interpreter so nothing is cached between runs.
+Usage: python benchmarks/import_time.py [--runs N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Name -> python snippet executed in a fresh interpreter
+CASES = {
+    "baseline (python -c pass)": "pass",
+    "cli --help": "import sys, cli; sys.argv = ['llm-transpiler', '--help']; cli.main()",
+    "import cli": "import cli",
+    "import utils": "import utils",
+    "import conditions": "import conditions",
+    "import languages": "import languages",
+    "import nodes": "import nodes",
+    "import simple_transpile": "import simple_transpile",
+    "import complex_transpile": "import complex_transpile",
+}
+
+
+def time_case(snippet: str, runs: int):
+    """Returns the wall times of running the snippet `runs` times, or the error if it fails"""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_DIR))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", snippet],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        timings.append(time.perf_counter() - start)
+
+        # `--help` exits through SystemExit(0), anything else is a real failure
+        if proc.returncode != 0:
+            return None, proc.stderr.decode("utf-8").strip().splitlines()[-1]
+
+    return timings, ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<30} {'median (ms)':>12} {'min (ms)':>10}")
+    for name, snippet in CASES.items():
+        timings, error = time_case(snippet, args.runs)
+        if timings is None:
+            print(f"{name:<30} {'failed':>12}   {error}")
+            continue
+
+        median = statistics.median(timings) * 1000
+        best = min(timings) * 1000
+        print(f"{name:<30} {median:>12.1f} {best:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
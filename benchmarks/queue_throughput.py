@@ -0,0 +1,72 @@
+"""
+Measures how the job throughput of the work queue scales with the number of workers.
+
+The jobs don't call the model, each one sleeps for `--job-ms` (standing in for the LLM calls)
+and parses a Python file (standing in for compiling and formatting).
+Usage: python benchmarks/queue_throughput.py [--jobs 200] [--workers 1 2 4 8]
+"""
+
+import os
+import sys
+import ast
+import time
+import argparse
+import tempfile
+from functools import partial
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from work_queue import WorkQueue, run_workers  # noqa: E402
+
+DUMMY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dummy")
+
+
+def fake_job(job: dict, job_ms: float) -> dict:
+    """Sleeps and parses the dummy Python file instead of running the graph"""
+    time.sleep(job_ms / 1000)
+    with open(os.path.join(DUMMY_DIR, "python", "LibraryManagementSystem.py")) as fl:
+        ast.parse(fl.read())
+    return {"iterations": 1, "error_status": 0, "error": ""}
+
+
+def measure(n_jobs: int, n_workers: int, job_ms: float) -> float:
+    """Returns the number of jobs per second finished by `n_workers` workers"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        java_file_path = os.path.join(tmp_dir, "Main.java")
+        with open(java_file_path, "w") as fl:
+            fl.write("class Main {}\n")
+
+        db_path = os.path.join(tmp_dir, "queue.db")
+        queue = WorkQueue(db_path)
+        for idx in range(n_jobs):
+            queue.enqueue(java_file_path, os.path.join(tmp_dir, f"out_{idx}.py"))
+        queue.close()
+
+        start = time.perf_counter()
+        n_done = run_workers(db_path, n_workers, partial(fake_job, job_ms=job_ms))
+        elapsed = time.perf_counter() - start
+
+        assert n_done == n_jobs, f"only {n_done} of {n_jobs} jobs finished"
+
+    return n_jobs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--job-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'jobs/s':>10} {'speedup':>8}")
+    base = None
+    for n_workers in args.workers:
+        throughput = measure(args.jobs, n_workers, args.job_ms)
+        base = base or throughput
+        print(f"{n_workers:>8} {throughput:>10.1f} {throughput / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Measures the memory held by the graph states of many runs.
+
+Every simulated run goes through the state updates of the complex graph: the summary, the search
+answers and a few code attempts, each stored the way the nodes store them. The "inline" layout keeps
+the strings in the fields of the old state, the other layouts build the real `complex_transpile.State`
+with references into a `BlobStore`:
+  - "concurrent": every run is alive at the same time, each with its own store
+  - "batch": runs one after another like `cli.py batch`, each run's store is dropped when it returns
+  - "disk": every run is alive at the same time and shares one store on disk (`--blob-dir`)
+Usage: python benchmarks/state_memory.py [--runs 10 100 1000]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from store import BlobStore  # noqa: E402
+from complex_transpile import State  # noqa: E402
+
+DUMMY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dummy")
+
+
+def load_sources():
+    """Returns the dummy Java and Python files used as stand-ins for the model outputs"""
+    with open(os.path.join(DUMMY_DIR, "java", "LibraryManagementSystem.java")) as fl:
+        java_code = fl.read()
+    with open(os.path.join(DUMMY_DIR, "python", "LibraryManagementSystem.py")) as fl:
+        python_code = fl.read()
+    return java_code, python_code
+
+
+def make_run(idx: int, java_code: str, python_code: str, n_attempts: int = 3):
+    """Builds the strings a single run produces, made unique per run"""
+    original = f"// run {idx}\n{java_code}"
+    attempts = [f"# run {idx}, attempt {i}\n{python_code}" for i in range(n_attempts)]
+    scratchpad = [f"Plan for run {idx}: " + "step. " * 200] + [
+        f"{q}. Question {q} of run {idx}: " + "answer " * 100 + "\n" for q in range(10)
+    ]
+    error = {"status": 1, "message": f"SyntaxError: invalid syntax (run {idx})"}
+    return original, attempts, scratchpad, error
+
+
+def inline_run(original, attempts, scratchpad, error, store):
+    """The old state, each attempt replaces the code and the scratchpad is one string"""
+    state = {
+        "code": "",
+        "original_code": original,
+        "scratchpad": "",
+        "error": error,
+        "iterations": 0,
+    }
+    state["scratchpad"] = "".join(scratchpad)
+    for attempt in attempts:
+        state["code"] = attempt
+        state["iterations"] += 1
+    return state
+
+
+def compact_run(original, attempts, scratchpad, error, store):
+    """The real state, updated with the same store calls as the nodes"""
+    store = store if store is not None else BlobStore()
+    state = State(
+        code=store.put(""),
+        original_code=store.put(original),
+        scratchpad=[],
+        error=error,
+        iterations=0,
+        error_history=[],
+        strategy=0,
+        stop_reason="",
+    )
+    state["scratchpad"] = [store.put(text) for text in scratchpad]
+    for attempt in attempts:
+        state["code"] = store.put(attempt)
+        state["iterations"] += 1
+        state["error_history"].append(error["message"])
+    return state, store
+
+
+def measure(n_runs: int, run, keep: bool = True, store_root=None) -> float:
+    """
+    Returns the bytes of memory held per run once `n_runs` runs are done
+    With `keep=False` the result of each run is dropped before the next one starts
+    """
+    java_code, python_code = load_sources()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    # Without a root every run creates its own in-memory store
+    shared_store = BlobStore(root=store_root) if store_root else None
+    results = []
+    for idx in range(n_runs):
+        # The generated strings are dropped once the state is built, like in a real run
+        result = run(*make_run(idx, java_code, python_code), shared_store)
+        if keep:
+            results.append(result)
+        del result
+
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return held / n_runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'runs':>6} {'inline':>11} {'concurrent':>13} {'batch':>11} {'disk':>11}")
+    for n_runs in args.runs:
+        inline = measure(n_runs, inline_run)
+        concurrent = measure(n_runs, compact_run)
+        batch = measure(n_runs, compact_run, keep=False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            on_disk = measure(n_runs, compact_run, store_root=tmp_dir)
+
+        print(
+            f"{n_runs:>6} {inline / 1024:>8.1f} KB {concurrent / 1024:>10.1f} KB "
+            f"{batch / 1024:>8.1f} KB {on_disk / 1024:>8.1f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures the insert and lookup speed of the translation memory.
+
+Fills a fresh memory with synthetic Java/Python method pairs, then times exact
+and near lookups for methods that are (and aren't) in the memory.
+Usage: python benchmarks/translation_memory.py [--entries 100000] [--queries 1000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from translation_memory import TranslationMemory  # noqa: E402
+
+# (Java, Python) statement pairs the synthetic methods are built from
+STATEMENTS = [
+    ("int total = {n};", "total = {n}"),
+    ("total += items.size();", "total += len(items)"),
+    ("for (Item item : items) {{ total += item.getCount() * {n}; }}", "for item in items:\n        total += item.get_count() * {n}"),
+    ("for (Map.Entry<String, Integer> e : counts.entrySet()) {{ total -= e.getValue(); }}", "for key, value in counts.items():\n        total -= value"),
+    ("if (total > {n}) {{ total = {n}; }}", "if total > {n}:\n        total = {n}"),
+    ("LocalDate due = LocalDate.now().plusDays({n});", "due = date.today() + timedelta(days={n})"),
+    ("String line = scanner.nextLine().trim();", "line = input().strip()"),
+    ('System.out.println("total: " + total);', 'print("total: " + str(total))'),
+]  # fmt: skip
+
+
+def make_pair(rng: random.Random):
+    """Builds a random method from 3 to 6 statements"""
+    chosen = [rng.choice(STATEMENTS) for _ in range(rng.randint(3, 6))]
+    n = rng.randint(0, 1000)
+    java = "public int compute(List<Item> items, Map<String, Integer> counts) {\n"
+    java += "".join(f"    {j.format(n=n)}\n" for j, _ in chosen)
+    java += "    return total;\n}"
+    python = "def compute(self, items, counts):\n"
+    python += "".join(f"    {p.format(n=n)}\n" for _, p in chosen)
+    python += "    return total"
+    return java, python
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pairs = [make_pair(rng) for _ in range(args.entries)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memory = TranslationMemory(os.path.join(tmp_dir, "memory.db"))
+
+        start = time.perf_counter()
+        with memory.conn:
+            for java, python in pairs:
+                memory._add("method", java, python)
+        elapsed = time.perf_counter() - start
+        print(
+            f"inserted {len(memory)} unique pairs in {elapsed:.1f}s "
+            f"({elapsed / args.entries * 1e6:.0f} us/pair)"
+        )
+
+        queries = {
+            "exact (hit)": [rng.choice(pairs)[0] for _ in range(args.queries)],
+            "exact (miss)": [
+                make_pair(rng)[0].replace("return total;", "return total + 1;")
+                for _ in range(args.queries)
+            ],
+        }
+        for name, codes in queries.items():
+            start = time.perf_counter()
+            hits = sum(memory.exact(code) is not None for code in codes)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<14} {elapsed / len(codes) * 1e3:.3f} ms/lookup, hits: {hits}/{len(codes)}"
+            )
+
+        start = time.perf_counter()
+        found = sum(bool(memory.similar(code)) for code in queries["exact (miss)"])
+        elapsed = time.perf_counter() - start
+        print(
+            f"{'similar':<14} {elapsed / args.queries * 1e3:.3f} ms/lookup, "
+            f"with matches: {found}/{args.queries}"
+        )
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+import os
+import sys
+import argparse
+
+from typing import List, Optional
+
+from pipeline import collect_jobs, get_runner, record_result
+
+# NOTE: Keep the imports in this file light. The transpile modules pull in
+# langchain and langgraph, so they are only imported once a command runs.
+
+
+def get_pair(args: argparse.Namespace):
+    """Returns the language pair selected on the command line"""
+    from languages import get_language_pair
+
+    return get_language_pair(args.language)
+
+
+def run_file(
+    args: argparse.Namespace,
+    source_file_path: str,
+    target_file_path: str,
+    run_formatter: bool = True,
+    store=None,
+    memory=None,
+):
+    """Runs the selected graph on a single file"""
+    run = get_runner(args.graph)
+    kwargs = dict(
+        model_name=args.model,
+        max_iter=args.max_iter,
+        is_debug=args.debug,
+        store=store,
+        memory=memory,
+        language=args.language,
+        tests_path=getattr(args, "tests", None),
+    )
+    if args.graph == "complex":
+        kwargs["prompts_path"] = args.prompts
+        kwargs["run_formatter"] = run_formatter
+
+    os.makedirs(os.path.dirname(target_file_path) or ".", exist_ok=True)
+    state = run(source_file_path, target_file_path, **kwargs)
+    record_result(source_file_path, target_file_path, state["stop_reason"] == "success")
+    return state
+
+
+def open_memory(args: argparse.Namespace, pair):
+    """Opens the translation memory (scoped to the source language) if one was given"""
+    if not args.memory:
+        return None
+
+    from translation_memory import TranslationMemory
+
+    return TranslationMemory(args.memory, pair)
+
+
+def cmd_single(args: argparse.Namespace) -> int:
+    """Handler for the `simple` and `complex` commands"""
+    pair = get_pair(args)
+    target_file_path = args.output or pair.output_path(
+        args.source, os.path.dirname(args.source)
+    )
+
+    if args.dry_run:
+        print(f"{args.source} -> {target_file_path}")
+        return 0
+
+    run_file(args, args.source, target_file_path, memory=open_memory(args, pair))
+    return 0
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    """Handler for the `batch` command"""
+    pair = get_pair(args)
+    jobs = collect_jobs(args.source, args.output, pair, force=args.force)
+
+    if not jobs:
+        print("[DEBUG] Nothing to transpile, all files are up to date")
+        return 0
+
+    store, memory = None, None
+    if not args.dry_run:
+        memory = open_memory(args, pair)
+
+    # Without a blob dir every run gets its own in-memory store, freed once the run returns
+    if args.blob_dir and not args.dry_run:
+        from store import BlobStore
+
+        store = BlobStore(root=args.blob_dir)
+
+    failed = []
+    for source_file_path, target_file_path in jobs:
+        print(f"{source_file_path} -> {target_file_path}")
+        if args.dry_run:
+            continue
+
+        # One failing file (an API error, a file that can't be read) doesn't stop the batch
+        try:
+            # Formatting is done for all files at once after the loop
+            run_file(
+                args,
+                source_file_path,
+                target_file_path,
+                run_formatter=False,
+                store=store,
+                memory=memory,
+            )
+        except Exception as e:
+            print(
+                f"[DEBUG] Failed to transpile '{source_file_path}': {type(e).__name__}: {e}"
+            )
+            failed.append(source_file_path)
+
+    if args.format and not args.dry_run:
+        from formatting import format_files
+
+        outputs = [path for _, path in jobs if os.path.exists(path)]
+        format_files(
+            outputs,
+            max_workers=args.jobs,
+            cache_path=args.format_cache,
+            formatter=pair.target.format,
+        )
+
+    if failed:
+        print(f"[DEBUG] {len(failed)} of {len(jobs)} files failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def cmd_enqueue(args: argparse.Namespace) -> int:
+    """Handler for the `enqueue` command (the coordinator)"""
+    from work_queue import WorkQueue
+
+    jobs = collect_jobs(args.source, args.output, get_pair(args), force=args.force)
+    queue = WorkQueue(args.queue)
+    n_queued = 0
+    for source_file_path, target_file_path in jobs:
+        job_id = queue.enqueue(
+            source_file_path,
+            target_file_path,
+            language=args.language,
+            graph=args.graph,
+            max_iter=args.max_iter,
+            max_attempts=args.max_attempts,
+            force=args.force,
+        )
+        n_queued += job_id is not None
+
+    print(f"[DEBUG] Enqueued {n_queued} jobs, queue status: {queue.stats()}")
+    queue.close()
+    return 0
+
+
+def cmd_worker(args: argparse.Namespace) -> int:
+    """Handler for the `worker` command"""
+    from functools import partial
+    from work_queue import run_worker, run_workers, transpile_job
+
+    handler = partial(transpile_job, model_name=args.model, memory_path=args.memory)
+    if args.processes > 1:
+        n_done = run_workers(
+            args.queue,
+            args.processes,
+            handler,
+            lease_seconds=args.lease_seconds,
+            stop_when_empty=not args.wait,
+        )
+    else:
+        n_done = run_worker(
+            args.queue,
+            handler=handler,
+            lease_seconds=args.lease_seconds,
+            stop_when_empty=not args.wait,
+        )
+
+    print(f"[DEBUG] Worker finished {n_done} jobs")
+    return 0
+
+
+def cmd_collect(args: argparse.Namespace) -> int:
+    """Handler for the `collect` command, writes the code returned by the workers to the target paths"""
+    from formatting import atomic_write
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(args.queue)
+    results = queue.results()
+    queue.close()
+
+    n_written = 0
+    for result in results:
+        target_file_path = result["target_file_path"]
+        if result["output"] is None:
+            continue
+
+        # Results are kept in the queue, so only write files that changed since the last collect
+        if os.path.exists(target_file_path):
+            with open(target_file_path, "r") as fl:
+                if fl.read() == result["output"]:
+                    continue
+
+        os.makedirs(os.path.dirname(target_file_path) or ".", exist_ok=True)
+        atomic_write(target_file_path, result["output"])
+        record_result(
+            result["source_file_path"],
+            target_file_path,
+            result["stop_reason"] == "success",
+            result["source_hash"],
+        )
+        n_written += 1
+
+    print(f"[DEBUG] Wrote {n_written} of {len(results)} results")
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    """Handler for the `status` command"""
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(args.queue)
+    for status, count in queue.stats().items():
+        print(f"{status:<10} {count}")
+    queue.close()
+    return 0
+
+
+def add_language_arg(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--language",
+        default="java-python",
+        help="Language pair to transpile: java-python, csharp-python or kotlin-python",
+    )
+
+
+def add_common_args(parser: argparse.ArgumentParser):
+    """Arguments shared by every command"""
+    add_language_arg(parser)
+    parser.add_argument("--model", default="gpt-4o-mini", help="OpenAI model name")
+    parser.add_argument(
+        "--max-iter",
+        type=int,
+        default=3,
+        help="Maximum number of transpile/compile iterations",
+    )
+    parser.add_argument(
+        "--debug",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Save intermediate files to disk",
+    )
+    parser.add_argument(
+        "--prompts",
+        default="prompts.json",
+        help="Path to the prompt templates (complex graph only)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print which files would be transpiled",
+    )
+    parser.add_argument(
+        "--memory",
+        default=None,
+        help="Path to the translation memory (SQLite file) to reuse and record verified translations",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the argument parser for the `llm-transpiler` command"""
+    parser = argparse.ArgumentParser(
+        prog="llm-transpiler",
+        description="LLM powered code transpiler (Java to Python by default)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for graph in ("simple", "complex"):
+        sub = subparsers.add_parser(
+            graph, help=f"Transpile a single file with the {graph} graph"
+        )
+        sub.add_argument("source", help="Path to the source file")
+        sub.add_argument(
+            "-o",
+            "--output",
+            default=None,
+            help="Path of the transpiled file (default: next to the source file)",
+        )
+        sub.add_argument(
+            "--tests",
+            default=None,
+            help="File with tests (plain asserts) to run against the transpiled code",
+        )
+        add_common_args(sub)
+        sub.set_defaults(func=cmd_single, graph=graph)
+
+    batch = subparsers.add_parser(
+        "batch", help="Transpile every source file in a directory"
+    )
+    batch.add_argument("source", help="Directory containing the source files")
+    batch.add_argument(
+        "-o", "--output", required=True, help="Directory for the transpiled files"
+    )
+    batch.add_argument(
+        "--graph",
+        choices=("simple", "complex"),
+        default="simple",
+        help="Which graph to run on each file",
+    )
+    batch.add_argument(
+        "--force",
+        action="store_true",
+        help="Transpile files even if they were already transpiled successfully",
+    )
+    batch.add_argument(
+        "--format",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Format all transpiled files with Black once the batch is done",
+    )
+    batch.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of formatter processes (default: number of cores)",
+    )
+    batch.add_argument(
+        "--format-cache",
+        default=None,
+        help="JSON file with the hashes of already formatted files",
+    )
+    batch.add_argument(
+        "--blob-dir",
+        default=None,
+        help="Keep the code blobs of all runs in one store on disk instead of in memory per run",
+    )
+    add_common_args(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    # Distributed mode: a coordinator enqueues jobs, workers on any machine run them
+    enqueue = subparsers.add_parser(
+        "enqueue", help="Add a job for every source file in a directory to the queue"
+    )
+    enqueue.add_argument("source", help="Directory containing the source files")
+    enqueue.add_argument(
+        "-o", "--output", required=True, help="Directory for the transpiled files"
+    )
+    enqueue.add_argument(
+        "--graph",
+        choices=("simple", "complex"),
+        default="simple",
+        help="Which graph to run on each file",
+    )
+    enqueue.add_argument(
+        "--max-iter",
+        type=int,
+        default=3,
+        help="Maximum number of transpile/compile iterations",
+    )
+    enqueue.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Number of times a failing job is retried",
+    )
+    enqueue.add_argument(
+        "--force",
+        action="store_true",
+        help="Enqueue files (and run finished jobs again) even if they were already transpiled successfully",
+    )
+    add_language_arg(enqueue)
+    enqueue.set_defaults(func=cmd_enqueue)
+
+    worker = subparsers.add_parser("worker", help="Run jobs from the queue")
+    worker.add_argument("--model", default="gpt-4o-mini", help="OpenAI model name")
+    worker.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Number of worker processes to start on this machine",
+    )
+    worker.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=600,
+        help="How long a job is leased without a heartbeat before another worker may take it over",
+    )
+    worker.add_argument(
+        "--wait",
+        action="store_true",
+        help="Keep polling for new jobs instead of exiting once the queue is empty",
+    )
+    worker.add_argument(
+        "--memory",
+        default=None,
+        help="Path to the translation memory (SQLite file) to reuse and record verified translations",
+    )
+    worker.set_defaults(func=cmd_worker)
+
+    collect = subparsers.add_parser(
+        "collect", help="Write the transpiled files returned by the workers"
+    )
+    collect.set_defaults(func=cmd_collect)
+
+    status = subparsers.add_parser("status", help="Show the number of jobs per status")
+    status.set_defaults(func=cmd_status)
+
+    for sub in (enqueue, worker, collect, status):
+        sub.add_argument(
+            "--queue",
+            default="transpile_queue.db",
+            help="Path to the SQLite queue file",
+        )
+
+    return parser
+
+
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Reports a wrong language pair, source file or tests as a usage error instead of a traceback"""
+    if not hasattr(args, "language"):
+        return
+
+    try:
+        pair = get_pair(args)
+        if args.func is cmd_single:
+            pair.check_source(args.source)
+        if getattr(args, "tests", None):
+            pair.check_tests()
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the `llm-transpiler` command"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,16 @@
-import os
+import sys
 import json
 from functools import partial
 
-from langchain_openai import ChatOpenAI
-from langgraph.graph import StateGraph, END
+from typing import TypedDict, List, Optional
 
-from typing import TypedDict
-
-from dotenv import load_dotenv, find_dotenv
-
-from conditions import compile_time_error
+from utils import load_model
+from store import BlobStore
+from translation_memory import TranslationMemory
+from languages import get_language_pair
+from conditions import compile_time_error, progress_node
 from nodes import (
+    reuse_translation,
     transpile_node,
     compile_node,
     summary_node,
@@ -21,11 +21,16 @@ from nodes import (
 
 
 class State(TypedDict):
+    # The code fields and the scratchpad only hold references into the `BlobStore`
     code: str
     original_code: str
-    scratchpad: str
+    scratchpad: List[str]
     error: dict
     iterations: int
+    # Error signatures seen so far, the current repair strategy and why the graph stopped
+    error_history: List[str]
+    strategy: int
+    stop_reason: str
 
 
 def init_graph(
@@ -35,9 +40,13 @@ def init_graph(
     search_node_fn,
     compile_node_fn,
     format_node_fn,
+    progress_node_fn,
     compile_time_error_fn,
 ):
     """Initialises the graph"""
+    # langgraph is slow to import, only load it once a graph is actually built
+    from langgraph.graph import StateGraph, END
+
     graph = StateGraph(State)
 
     # Add all the nodes
@@ -47,6 +56,7 @@ def init_graph(
     graph.add_node("search_node", search_node_fn)
     graph.add_node("compile", compile_node_fn)
     graph.add_node("format", format_node_fn)
+    graph.add_node("progress", progress_node_fn)
 
     # Set the entry point to be the transpile node
     graph.set_entry_point("summary")
@@ -56,11 +66,12 @@ def init_graph(
     graph.add_edge("step_generation", "search_node")
     graph.add_edge("search_node", "transpile")
     graph.add_edge("transpile", "compile")
+    graph.add_edge("compile", "progress")
     graph.add_edge("format", END)
 
-    # Add a conditional edge from compile to transpile if compilation failed
+    # Add a conditional edge back to transpile if compilation failed and the repairs are making progress
     graph.add_conditional_edges(
-        "compile",
+        "progress",
         compile_time_error_fn,
         {"terminate": "format", "continue": "transpile"},
     )
@@ -68,58 +79,88 @@ def init_graph(
     return graph
 
 
-if __name__ == "__main__":
-    # Load the env secrets
-    load_dotenv(find_dotenv())
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-    # Init the model and other parameters
-    model_name = "gpt-4o-mini"
-    is_debug = True
-    max_iter = 3
-
-    # Python file will have the same name as Java file but changed folder and extensions
-    java_file_path = "dummy/java/LibraryManagementSystem.java"
-    python_file_path = os.path.join(
-        "dummy/python", os.path.basename(java_file_path).replace(".java", ".py")
-    )
+def run(
+    source_file_path: str,
+    target_file_path: str,
+    model_name: str = "gpt-4o-mini",
+    max_iter: int = 3,
+    is_debug: bool = True,
+    prompts_path: str = "prompts.json",
+    run_formatter: bool = True,
+    store: Optional[BlobStore] = None,
+    memory: Optional[TranslationMemory] = None,
+    language: str = "java-python",
+    tests_path: Optional[str] = None,
+):
+    """Transpiles a single file (Java to Python by default) using the complex graph"""
+    pair = get_language_pair(language)
+    model = load_model(model_name, temperature=0.2)
+    store = store if store is not None else BlobStore()
 
-    model = ChatOpenAI(model=model_name, temperature=0.2, api_key=OPENAI_API_KEY)
+    # Read in the original code file, only its reference is kept in the state
+    with open(source_file_path, "r") as fl:
+        original_code = store.put(fl.read())
 
-    # Read in the original java code file
-    with open(java_file_path, "r") as fl:
-        java_code = fl.read()
+    tests = pair.read_tests(tests_path) if tests_path else None
 
-    # Read the prompts
-    with open("prompts.json", "r") as fl:
-        prompts = json.load(fl)
+    # Read the prompts and fill in the languages
+    with open(prompts_path, "r") as fl:
+        prompts = pair.prompts(json.load(fl))
 
     # Define an initial state
     state = State(
-        code="",
-        original_code=java_code,
-        scratchpad="",
+        code=store.put(""),
+        original_code=original_code,
+        scratchpad=[],
         error={
             "status": 0,
             "message": "",
         },
         iterations=0,
+        error_history=[],
+        strategy=0,
+        stop_reason="",
     )
 
+    # An exact match in the translation memory is reused without running the graph
+    examples = ""
+    if memory is not None:
+        reused, examples = memory.suggest(store.get(original_code))
+        if reused is not None and reuse_translation(
+            state, reused, store, target_file_path, pair, tests, run_formatter
+        ):
+            return state
+
     # LLM-nodes
-    summary_node_fn = partial(summary_node, model=model, templates=prompts)
-    transpile_node_fn = partial(transpile_node, model=model, templates=prompts)
+    summary_node_fn = partial(summary_node, model=model, templates=prompts, store=store)
+    transpile_node_fn = partial(
+        transpile_node,
+        model=model,
+        templates=prompts,
+        store=store,
+        examples=examples,
+        language=pair,
+    )
     step_generation_node_fn = partial(
-        step_generation_node, model=model, templates=prompts
+        step_generation_node, model=model, templates=prompts, store=store
     )
-    search_node_fn = partial(search_node, model=model, templates=prompts)
+    search_node_fn = partial(search_node, model=model, templates=prompts, store=store)
 
     # Non-LLM nodes
-    compile_node_fn = partial(compile_node, debug=is_debug)
-    format_node_fn = partial(format_node, save_file_path=python_file_path)
+    compile_node_fn = partial(
+        compile_node, store=store, debug=is_debug, language=pair, tests=tests
+    )
+    format_node_fn = partial(
+        format_node,
+        save_file_path=target_file_path,
+        store=store,
+        run_formatter=run_formatter,
+        language=pair,
+    )
 
     # Decision nodes
-    compile_time_error_fn = partial(compile_time_error, max_iter=max_iter)
+    progress_node_fn = partial(progress_node, max_iter=max_iter)
+    compile_time_error_fn = compile_time_error
 
     # Init the graph and compile it
     graph = init_graph(
@@ -129,8 +170,21 @@ if __name__ == "__main__":
         search_node_fn,
         compile_node_fn,
         format_node_fn,
+        progress_node_fn,
         compile_time_error_fn,
     ).compile()
 
     # Run the graph
-    graph.invoke(state)
+    state = graph.invoke(state)
+
+    # Only code that compiled is added to the translation memory
+    if memory is not None and state["stop_reason"] == "success":
+        memory.record(store.get(state["original_code"]), store.get(state["code"]))
+
+    return state
+
+
+if __name__ == "__main__":
+    from cli import main
+
+    sys.exit(main(["complex", *sys.argv[1:]]))
@@ -1,9 +1,78 @@
-from typing import Any
+import re
+import hashlib
 
+from typing import Any, List
 
-def compile_time_error(state: Any, max_iter: int = 3):
-    """If there was a compile time error, it takes the code back to transpile node"""
-    if state["error"]["status"] == 0 or state["iterations"] > max_iter:
+# Strategies the transpile node escalates through when the repairs stop making progress.
+# `temperature` and `model` are bound to the chat model, `chunked` only asks the model to
+# repair the lines around the error instead of regenerating the whole file.
+DEFAULT_STRATEGIES = [
+    {"name": "default"},
+    {"name": "temperature", "temperature": 0.7},
+    {"name": "chunked", "context_lines": 10},
+    {"name": "bigger_model", "model": "gpt-4o"},
+]
+
+
+def error_signature(error: dict) -> str:
+    """Returns a short signature of an error, the same error on the same line gives the same signature"""
+    lines = [line for line in error["message"].strip().split("\n") if line.strip()]
+    # Compile errors start with the error, test failures (tracebacks) end with the exception
+    summary = (lines[-1] if error["status"] == 2 else lines[0]) if lines else ""
+    # Ignore column offsets and whitespace so cosmetic changes don't look like progress
+    summary = re.sub(r"\s+", " ", re.sub(r"[Cc]olumn \d+", "", summary))
+    key = f"{error['status']}:{error.get('line')}:{summary}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def detect_stall(history: List[str]) -> str:
+    """Returns 'repeat' if the last error is the same as the previous one, 'oscillation' if it came back after another error"""
+    if len(history) >= 2 and history[-1] == history[-2]:
+        return "repeat"
+    if len(history) >= 3 and history[-1] == history[-3]:
+        return "oscillation"
+    return ""
+
+
+def progress_node(
+    state: Any, max_iter: int = 3, strategies: List[dict] = DEFAULT_STRATEGIES
+) -> Any:
+    """
+    Tracks the error signatures across iterations and decides whether to stop, escalate the strategy or continue
+    The decision is recorded in `stop_reason` (empty while the graph should continue)
+    """
+    if state["error"]["status"] == 0:
+        state["stop_reason"] = "success"
+        return state
+
+    state["error_history"].append(error_signature(state["error"]))
+
+    # `iterations` counts the transpile calls, so at most `max_iter` calls are made
+    if state["iterations"] >= max_iter:
+        state["stop_reason"] = "max_iter"
+        return state
+
+    stall = detect_stall(state["error_history"])
+    if stall:
+        if state["strategy"] + 1 < len(strategies):
+            # Skip strategies that the remaining calls can't reach, so the strongest ones still run
+            remaining = max_iter - state["iterations"]
+            state["strategy"] = max(state["strategy"] + 1, len(strategies) - remaining)
+            # Start over with the new strategy, so it gets a chance before stalling again
+            state["error_history"] = state["error_history"][-1:]
+            print(
+                f"[DEBUG] Error {stall} detected, escalating to strategy: {strategies[state['strategy']]['name']}"
+            )
+        else:
+            state["stop_reason"] = stall
+
+    return state
+
+
+def compile_time_error(state: Any):
+    """If there was a compile time error (and the progress node didn't stop the run), it takes the code back to transpile node"""
+    if state["stop_reason"]:
+        print(f"[DEBUG] Stopping, reason: {state['stop_reason']}")
         return "terminate"
     else:
         return "continue"
@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
+
+
+def content_hash(code: str) -> str:
+    """Returns the sha256 hash of a code string"""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def format_code(code: str) -> str:
+    """
+    Formats the code using Black to match PEP8 standards
+    Already formatted code is returned as is instead of raising `NothingChanged`
+    """
+    # Black is slow to import, only load it when something has to be formatted
+    import black
+
+    mode = black.FileMode(string_normalization=False)
+    try:
+        # The code has already been parsed by the compile node, so the
+        # (expensive) AST equivalence check of `fast=False` is skipped
+        return black.format_file_contents(code, fast=True, mode=mode)
+    except black.NothingChanged:
+        return code
+
+
+def atomic_write(path: str, content: str):
+    """Writes to a temp file in the same folder and renames it, so readers never see a partial file"""
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fl:
+            fl.write(content)
+        # mkstemp creates the file as 0600, keep the permissions of the file being replaced
+        mode = os.stat(path).st_mode if os.path.exists(path) else 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class FormatCache:
+    """Set of content hashes that are known to be formatted, optionally persisted as JSON"""
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path
+        self.hashes = set()
+
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r") as fl:
+                self.hashes = set(json.load(fl))
+
+    def __contains__(self, code_hash: str) -> bool:
+        return code_hash in self.hashes
+
+    def add(self, code_hash: str):
+        self.hashes.add(code_hash)
+
+    def save(self):
+        if self.cache_path:
+            atomic_write(self.cache_path, json.dumps(sorted(self.hashes)))
+
+
+def _format_file(path: str, formatter: Callable[[str], str] = format_code):
+    """
+    Formats a single file in place, runs inside the worker processes
+    Returns the path, the hash of the formatted code (None if it failed) and the status
+    """
+    with open(path, "r") as fl:
+        code = fl.read()
+
+    # Outputs of failed runs may not parse, they are reported instead of stopping the whole batch.
+    # The formatter comes from the target language, so any exception counts as a failure
+    try:
+        formatted = formatter(code)
+    except Exception as e:
+        print(f"[DEBUG] Could not format '{path}': {type(e).__name__}: {e}")
+        return path, None, "failed"
+
+    if formatted == code:
+        return path, content_hash(code), "unchanged"
+
+    atomic_write(path, formatted)
+    return path, content_hash(formatted), "formatted"
+
+
+def format_files(
+    paths: Iterable[str],
+    max_workers: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    formatter: Callable[[str], str] = format_code,
+) -> dict:
+    """
+    Formats many files in parallel using a process pool
+    Files whose content hash is already in the cache are skipped without starting the formatter,
+    files that can't be formatted are counted as failed and left as they are
+    """
+    cache = FormatCache(cache_path)
+
+    pending = []
+    stats = {"formatted": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    for path in paths:
+        with open(path, "r") as fl:
+            code_hash = content_hash(fl.read())
+
+        if code_hash in cache:
+            stats["skipped"] += 1
+        else:
+            pending.append(path)
+
+    if pending:
+        max_workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(pending) // (max_workers * 4))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for path, code_hash, status in executor.map(
+                partial(_format_file, formatter=formatter), pending, chunksize=chunksize
+            ):
+                # Only formatted code goes in the cache, so failed files are retried next time
+                if code_hash is not None:
+                    cache.add(code_hash)
+                stats[status] += 1
+
+    cache.save()
+    print(
+        f"[DEBUG] Formatting done, formatted: {stats['formatted']}, "
+        f"unchanged: {stats['unchanged']}, skipped (cached): {stats['skipped']}, "
+        f"failed: {stats['failed']}"
+    )
+    return stats
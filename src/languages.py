@@ -0,0 +1,426 @@
+import os
+import re
+import ast
+import keyword
+import builtins
+import textwrap
+import tokenize
+
+from io import StringIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils import python_compile, python_run_tests, sanitize_output, sanitize_chunk
+from formatting import format_code
+
+# Tokenizer shared by the C-like source languages (Java, C#, Kotlin)
+JAVA_TOKEN = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*[\s\S]*?\*/)
+    |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    |(?P<number>\d[\w.]*)
+    |(?P<name>[A-Za-z_$][\w$]*)
+    |(?P<op>[^\s\w])
+    """,
+    re.VERBOSE,
+)
+
+# fmt: off
+JAVA_KEYWORDS = {
+    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char",
+    "class", "continue", "default", "do", "double", "else", "enum", "extends",
+    "final", "finally", "float", "for", "if", "implements", "import", "instanceof",
+    "int", "interface", "long", "native", "new", "package", "private", "protected",
+    "public", "return", "short", "static", "super", "switch", "synchronized", "this",
+    "throw", "throws", "transient", "try", "void", "volatile", "while", "var",
+    "true", "false", "null",
+}
+# fmt: on
+
+# A name followed by "(" after one of these is a call, not a method declaration
+NOT_DECLARATION_PREFIX = {"new", "else", "return", "throw", "case"}
+
+
+def tokenize_java(code: str) -> List[Tuple[str, str, int, int]]:
+    """Splits Java code into (kind, text, start, end) tokens, comments are dropped"""
+    tokens = []
+    for match in JAVA_TOKEN.finditer(code):
+        kind = match.lastgroup
+        if kind != "comment":
+            tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def matching_bracket(tokens: list, idx: int, open_: str, close: str) -> int:
+    """Returns the index of the token closing the bracket at `idx`"""
+    depth = 0
+    for j in range(idx, len(tokens)):
+        if tokens[j][1] == open_:
+            depth += 1
+        elif tokens[j][1] == close:
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens) - 1
+
+
+def class_spans(
+    tokens: list, keywords: Tuple[str, ...] = ("class", "interface", "enum")
+) -> List[Tuple[str, int, int]]:
+    """Returns the name and the token span of the body of every class, used to find the class a method belongs to"""
+    classes = []
+    for idx in range(len(tokens) - 1):
+        if tokens[idx][1] in keywords and tokens[idx + 1][0] == "name":
+            brace = next(
+                (j for j in range(idx, len(tokens)) if tokens[j][1] == "{"), None
+            )
+            if brace is not None:
+                end = matching_bracket(tokens, brace, "{", "}")
+                classes.append((tokens[idx + 1][1], brace, end))
+    return classes
+
+
+def enclosing_class(classes: List[Tuple[str, int, int]], idx: int) -> Optional[str]:
+    """Returns the innermost class whose body contains the token at `idx`"""
+    enclosing = [c for c in classes if c[1] < idx < c[2]]
+    return enclosing[-1][0] if enclosing else None
+
+
+def split_java_methods(code: str) -> List[Dict]:
+    """
+    Splits Java code into its methods and constructors
+    Returns dicts with the method `name`, its enclosing `class` and its source `code` (including modifiers)
+    """
+    tokens = tokenize_java(code)
+    classes = class_spans(tokens)
+
+    methods = []
+    idx = 1
+    while idx < len(tokens) - 1:
+        kind, text, _, _ = tokens[idx]
+        prev = tokens[idx - 1]
+        is_declaration = (
+            kind == "name"
+            and text not in JAVA_KEYWORDS
+            and tokens[idx + 1][1] == "("
+            and (
+                (prev[0] == "name" and prev[1] not in NOT_DECLARATION_PREFIX)
+                or prev[1] in (">", "]")
+            )
+        )
+        if not is_declaration:
+            idx += 1
+            continue
+
+        # Skip the parameters and an optional throws clause
+        body = matching_bracket(tokens, idx + 1, "(", ")") + 1
+        if body < len(tokens) and tokens[body][1] == "throws":
+            while body < len(tokens) and tokens[body][1] not in ("{", ";"):
+                body += 1
+        if body >= len(tokens) or tokens[body][1] != "{":
+            idx += 1
+            continue
+
+        end = matching_bracket(tokens, body, "{", "}")
+
+        # The declaration starts after the previous statement or block
+        start = idx
+        while start > 0 and tokens[start - 1][1] not in (";", "{", "}"):
+            start -= 1
+
+        methods.append(
+            {
+                "name": text,
+                "class": enclosing_class(classes, idx),
+                "code": code[tokens[start][2] : tokens[end][3]],
+            }
+        )
+        # Methods of anonymous classes are part of the enclosing method
+        idx = end + 1
+
+    return methods
+
+
+def split_kotlin_functions(code: str) -> List[Dict]:
+    """
+    Splits Kotlin code into its functions (only functions with a block body)
+    Returns dicts with the function `name`, its enclosing `class` and its source `code` (including modifiers)
+    """
+    tokens = tokenize_java(code)
+    classes = class_spans(tokens, ("class", "interface", "object"))
+
+    functions = []
+    idx = 0
+    while idx < len(tokens):
+        if tokens[idx][1] != "fun":
+            idx += 1
+            continue
+
+        # The name is right before the parameters, this skips generics and receiver types
+        paren = next((j for j in range(idx, len(tokens)) if tokens[j][1] == "("), None)
+        if paren is None:
+            break
+
+        # Skip the return type, expression bodies (`= ...`) are left out
+        body = matching_bracket(tokens, paren, "(", ")") + 1
+        while body < len(tokens) and tokens[body][1] not in ("{", "=", "}"):
+            body += 1
+        if body >= len(tokens) or tokens[body][1] != "{":
+            idx = body
+            continue
+
+        end = matching_bracket(tokens, body, "{", "}")
+
+        # Kotlin has no semicolons, so the declaration starts at the beginning of its line
+        start = code.rfind("\n", 0, tokens[idx][2]) + 1
+        functions.append(
+            {
+                "name": tokens[paren - 1][1],
+                "class": enclosing_class(classes, idx),
+                "code": code[start : tokens[end][3]],
+            }
+        )
+        idx = end + 1
+
+    return functions
+
+
+# A reused translation can't be renamed to these, the code would still parse but do something else
+RESERVED_PYTHON_NAMES = (
+    set(keyword.kwlist) | set(keyword.softkwlist) | set(dir(builtins))
+)
+
+
+def snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def python_function_names(name: str, class_name: Optional[str]) -> List[str]:
+    """Names a source method can have in Python, constructors become __init__ and camelCase usually becomes snake_case"""
+    if name == class_name:
+        return ["__init__"]
+    return [name, snake_case(name)]
+
+
+def split_python_functions(code: str) -> Dict[Tuple[Optional[str], str], str]:
+    """Returns the source of the module level functions and methods, keyed by (class, name)"""
+    tree = ast.parse(code)
+    lines = code.split("\n")
+
+    def source(node):
+        start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+        return textwrap.dedent("\n".join(lines[start - 1 : node.end_lineno]))
+
+    functions = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions[(None, node.name)] = source(node)
+        elif isinstance(node, ast.ClassDef):
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    functions[(node.name, child.name)] = source(child)
+    return functions
+
+
+def rename_python_identifiers(
+    python_code: str, mapping: Dict[str, str], reserved: set = RESERVED_PYTHON_NAMES
+) -> Optional[str]:
+    """
+    Renames the identifiers of Python code, both as is and in their snake_case form
+    Attributes and keyword arguments are left alone, their names are fixed by the object or function they belong to
+    Returns None if a new name is reserved (Python keywords and builtins by default) or already used by another name,
+    or if a renamed name is also used as an attribute or keyword argument (e.g. `self.name(...)` or `print(end="")`)
+    """
+    names = dict(mapping)
+    for old, new in mapping.items():
+        names.setdefault(snake_case(old), snake_case(new))
+
+    skipped = (tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT, tokenize.INDENT)
+    tokens = [
+        tok
+        for tok in tokenize.generate_tokens(StringIO(python_code).readline)
+        if tok.type not in skipped
+    ]
+
+    lines = python_code.split("\n")
+    replacements = []
+    used, fixed = set(), set()
+    # Kind of every open bracket, keyword arguments can only appear in calls (and class bases)
+    brackets = []
+    for idx, tok in enumerate(tokens):
+        prev = tokens[idx - 1].string if idx > 0 else ""
+        after = tokens[idx + 1].string if idx + 1 < len(tokens) else ""
+
+        if tok.string == "(":
+            is_signature = idx > 1 and tokens[idx - 2].string == "def"
+            is_call = tokens[idx - 1].type == tokenize.NAME or prev in (")", "]")
+            brackets.append("signature" if is_signature else "call" if is_call else "(")
+        elif tok.string in ("[", "{"):
+            brackets.append(tok.string)
+        elif tok.string in (")", "]", "}") and brackets:
+            brackets.pop()
+
+        if tok.type != tokenize.NAME:
+            continue
+
+        is_keyword_argument = after == "=" and brackets and brackets[-1] == "call"
+        if prev == "." or is_keyword_argument:
+            fixed.add(tok.string)
+        else:
+            used.add(tok.string)
+            if tok.string in names:
+                replacements.append((tok.start, tok.end, names[tok.string]))
+
+    # The attribute or argument may or may not be the renamed name, so it's safer not to reuse the code
+    if used & fixed & set(names):
+        return None
+
+    # Names that are renamed away are free to be reused (e.g. two names swapped)
+    taken = reserved | (used - set(names))
+    if any(new in taken for _, _, new in replacements):
+        return None
+
+    # Replace from the end, so that the earlier positions stay valid
+    for (row, col), (_, end_col), new in reversed(replacements):
+        line = lines[row - 1]
+        lines[row - 1] = line[:col] + new + line[end_col:]
+    return "\n".join(lines)
+
+
+class SourceLanguage:
+    """Language the code is transpiled from"""
+
+    def __init__(
+        self,
+        name: str,
+        extension: str,
+        split: Callable[[str], List[Dict]],
+        key: Optional[str] = None,
+    ):
+        self.name = name
+        self.key = key or name.lower()
+        self.extension = extension
+        # Splits the code into methods, used by the translation memory
+        self.split = split
+
+
+class TargetLanguage:
+    """
+    Language the code is transpiled to
+    `validate`, `format` and `sanitize` run in-process, since they are called on every iteration of every file
+    """
+
+    def __init__(
+        self,
+        name: str,
+        extension: str,
+        validate: Callable[[str, dict], dict],
+        format: Callable[[str], str],
+        split: Callable[[str], Dict[Tuple[Optional[str], str], str]],
+        function_names: Callable[[str, Optional[str]], List[str]],
+        rename: Callable[[str, Dict[str, str], set], Optional[str]],
+        reserved: set,
+        sanitize: Callable[[str], str],
+        sanitize_chunk: Callable[[str], str],
+        run_tests: Optional[Callable[[str, str, dict], dict]] = None,
+    ):
+        self.name = name
+        self.extension = extension
+        self.validate = validate
+        self.format = format
+        # Splits the code into its functions and renames identifiers, used by the translation memory
+        self.split = split
+        self.function_names = function_names
+        self.rename = rename
+        self.reserved = reserved
+        # Extracts the code from the model's answers
+        self.sanitize = sanitize
+        self.sanitize_chunk = sanitize_chunk
+        # Runs the tests against the code, a failing test sets the error status to 2
+        self.run_tests = run_tests
+
+
+class LanguagePair:
+    """A source and a target language, everything the graphs need to know about the languages they transpile"""
+
+    def __init__(self, source: SourceLanguage, target: TargetLanguage):
+        self.source = source
+        self.target = target
+        self.name = f"{source.key}-{target.name.lower()}"
+
+    def render(self, template: str) -> str:
+        """Fills in the {source} and {target} placeholders, leaving the other fields for later"""
+        return template.replace("{source}", self.source.name).replace(
+            "{target}", self.target.name
+        )
+
+    def prompts(self, templates: dict) -> dict:
+        return {key: self.render(template) for key, template in templates.items()}
+
+    def check_tests(self):
+        """Raises a ValueError if the target language has no test runner"""
+        if self.target.run_tests is None:
+            raise ValueError(f"Tests can't be run against {self.target.name} code")
+
+    def read_tests(self, tests_path: str) -> str:
+        """Reads the tests for the transpiled code, raises a ValueError if the target language can't run them"""
+        self.check_tests()
+        with open(tests_path, "r") as fl:
+            return fl.read()
+
+    def check_source(self, source_file_path: str):
+        """Raises a ValueError if the file doesn't have the extension of the source language"""
+        if not source_file_path.endswith(self.source.extension):
+            raise ValueError(
+                f"'{source_file_path}' is not a {self.source.name} file (expected {self.source.extension}), "
+                f"pick the language pair with --language"
+            )
+
+    def output_path(self, source_file_path: str, output_dir: str) -> str:
+        """Target file will have the same name as the source file but changed folder and extensions"""
+        self.check_source(source_file_path)
+        name = os.path.basename(source_file_path)[: -len(self.source.extension)]
+        return os.path.join(output_dir, name + self.target.extension)
+
+
+JAVA = SourceLanguage("Java", ".java", split_java_methods)
+# Methods are declared like in Java (modifiers, type, name, parameters, block)
+CSHARP = SourceLanguage("C#", ".cs", split_java_methods, key="csharp")
+KOTLIN = SourceLanguage("Kotlin", ".kt", split_kotlin_functions)
+
+PYTHON = TargetLanguage(
+    "Python",
+    ".py",
+    validate=python_compile,
+    format=format_code,
+    split=split_python_functions,
+    function_names=python_function_names,
+    rename=rename_python_identifiers,
+    reserved=RESERVED_PYTHON_NAMES,
+    sanitize=sanitize_output,
+    sanitize_chunk=sanitize_chunk,
+    run_tests=python_run_tests,
+)
+
+LANGUAGE_PAIRS = {}
+
+
+def register_language_pair(pair: LanguagePair) -> LanguagePair:
+    """Makes a language pair available to the graphs and the command line"""
+    LANGUAGE_PAIRS[pair.name] = pair
+    return pair
+
+
+def get_language_pair(name: Optional[str] = None) -> LanguagePair:
+    """Returns the registered language pair, Java to Python by default"""
+    if name is None:
+        return JAVA_PYTHON
+    if name not in LANGUAGE_PAIRS:
+        raise ValueError(
+            f"Unknown language pair '{name}', available: {', '.join(LANGUAGE_PAIRS)}"
+        )
+    return LANGUAGE_PAIRS[name]
+
+
+JAVA_PYTHON = register_language_pair(LanguagePair(JAVA, PYTHON))
+CSHARP_PYTHON = register_language_pair(LanguagePair(CSHARP, PYTHON))
+KOTLIN_PYTHON = register_language_pair(LanguagePair(KOTLIN, PYTHON))
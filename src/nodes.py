@@ -1,42 +1,126 @@
 import json
-import black
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_community.utilities import GoogleSerperAPIWrapper
 
-from typing import Any
+from typing import Any, List, Optional
 
-from utils import sanitize_output, python_compile, generate_questions
+from utils import (
+    generate_questions,
+    bind_strategy,
+    extract_chunk,
+    splice_chunk,
+)
+from conditions import DEFAULT_STRATEGIES
+from languages import LanguagePair, JAVA_PYTHON
+from formatting import atomic_write
+from store import BlobStore
+
+# Upper bound on the scratchpad text that is sent to the model
+MAX_SCRATCHPAD_CHARS = 16000
+
+
+def reuse_translation(
+    state: Any,
+    code: str,
+    store: BlobStore,
+    save_file_path: str,
+    language: LanguagePair = JAVA_PYTHON,
+    tests: Optional[str] = None,
+    run_formatter: bool = True,
+) -> bool:
+    """
+    Validates, formats and saves a translation from the translation memory without running the graph
+    Returns False (and leaves the state alone) if the code doesn't validate or fails the tests
+    """
+    error = language.target.validate(code, {"status": 0, "message": ""})
+    if error["status"] == 0 and tests:
+        error = language.target.run_tests(code, tests, error)
+    if error["status"] != 0:
+        print("[DEBUG] The translation from the translation memory failed, transpiling")
+        return False
+
+    print("[DEBUG] Reusing a verified translation from the translation memory")
+    if run_formatter:
+        code = language.target.format(code)
+    atomic_write(save_file_path, code)
+
+    state["code"] = store.put(code)
+    state["error"] = error
+    state["stop_reason"] = "success"
+    return True
+
+
+def read_scratchpad(
+    state: Any, store: BlobStore, max_chars: int = MAX_SCRATCHPAD_CHARS
+) -> str:
+    """Joins the scratchpad blobs of the state, keeping at most `max_chars` characters"""
+    scratchpad = store.join(state["scratchpad"])
+    return scratchpad[:max_chars]
 
 
 def transpile_node(
     state: Any,
     model: Any,
     templates: dict,
+    store: BlobStore,
+    strategies: List[dict] = DEFAULT_STRATEGIES,
+    examples: str = "",
+    language: LanguagePair = JAVA_PYTHON,
 ) -> Any:
     """
-    Transpile Node that handles the main transpiling task based on the error status
+    Transpile Node that handles the main transpiling task based on the error status and the current repair strategy
     """
     print(f"[DEBUG]: Transpiling code, iter: {state['iterations']}")
 
+    scratchpad = read_scratchpad(state, store)
+    original_code = store.get(state["original_code"])
+    code = store.get(state["code"])
+    system_prompt = templates["transpile"].format(scratchpad)
+
+    # Verified translations of similar code from the translation memory
+    if examples:
+        system_prompt += templates["transpile_examples"].format(examples)
+
+    strategy = strategies[state["strategy"]]
+    model = bind_strategy(model, strategy)
+
+    # Chunked repair only sends (and replaces) the lines around a compile error
+    chunk = None
+    if (
+        "context_lines" in strategy
+        and state["error"]["status"] == 1
+        and state["error"].get("line")
+    ):
+        chunk = extract_chunk(code, state["error"]["line"], strategy["context_lines"])
+
     # If there is no error, add the initial prompt and run the transpilation
     if state["error"]["status"] == 0:
         messages = [
-            SystemMessage(content=templates["transpile"].format(state["scratchpad"])),
-            HumanMessage(content=state["original_code"]),
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=original_code),
         ]
 
     else:
         messages = [
-            SystemMessage(content=templates["transpile"].format(state["scratchpad"])),
-            HumanMessage(content=state["original_code"]),
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=original_code),
         ]
 
         # If there was an error choose the human message based on the error code
         # Codes - 0 (no error), 1 (error compiling), 2 (compiles but the outputs don't match)
-        error_messages = [AIMessage(content=state["code"])]
+        error_messages = [AIMessage(content=code)]
+
+        # Program did not compile, only the failing lines have to be fixed
+        if chunk is not None:
+            error_messages.append(
+                HumanMessage(
+                    content=templates["transpile_chunk_err"].format(
+                        chunk[0], chunk[1], state["error"]["message"], chunk[2]
+                    )
+                )
+            )
 
         # Program did not compile
-        if state["error"]["status"] == 1:
+        elif state["error"]["status"] == 1:
             error_messages.append(
                 HumanMessage(
                     content=templates["transpile_compile_err"].format(
@@ -49,7 +133,7 @@ def transpile_node(
         else:
             error_messages.append(
                 HumanMessage(
-                    content=templates["templates_output_err"].format(
+                    content=templates["transpile_output_err"].format(
                         state["error"]["message"]
                     )
                 )
@@ -65,85 +149,119 @@ def transpile_node(
 
     # Get the output from model and clean it
     output = model.invoke(messages)
-    output = sanitize_output(output.content)
+    if chunk is not None:
+        chunk_code = language.target.sanitize_chunk(output.content)
+        output = splice_chunk(code, chunk[0], chunk[1], chunk_code)
+    else:
+        output = language.target.sanitize(output.content)
 
-    state["code"] = output
+    state["code"] = store.put(output)
     state["iterations"] += 1
     return state
 
 
-def compile_node(state: Any, debug: bool = True) -> Any:
+def compile_node(
+    state: Any,
+    store: BlobStore,
+    debug: bool = True,
+    language: LanguagePair = JAVA_PYTHON,
+    tests: Optional[str] = None,
+) -> Any:
     """
-    Compile node that parses the Python code using AST and returns a state with error status and messages (if any)
+    Compile node that validates the code with the target language's validator (and runs the tests, if any)
+    Returns a state with error status and messages (if any)
     """
     print("[DEBUG]: Compiling Code")
 
-    code = state["code"]
-    state["error"] = python_compile(code, state["error"])
+    code = store.get(state["code"])
+    state["error"] = language.target.validate(code, state["error"])
+    if state["error"]["status"] == 0 and tests:
+        state["error"] = language.target.run_tests(code, tests, state["error"])
 
     return state
 
 
-def summary_node(state: Any, model: Any, templates: dict) -> Any:
+def summary_node(state: Any, model: Any, templates: dict, store: BlobStore) -> Any:
     """Generates summary of the original code file"""
     print("[DEBUG]: Generating Code summary")
     messages = [
         SystemMessage(content=templates["summary"]),
-        HumanMessage(content=state["original_code"]),
+        HumanMessage(content=store.get(state["original_code"])),
     ]
 
     # Get the output from model and clean it
     output = model.invoke(messages)
-    state["scratchpad"] = output.content
+    state["scratchpad"] = [store.put(output.content)]
 
     return state
 
 
-def format_node(state: Any, save_file_path: str) -> Any:
-    """Formats the code using Black to match PEP8 standards"""
-    print("[DEBUG] Formatting the code")
+def format_node(
+    state: Any,
+    save_file_path: str,
+    store: BlobStore,
+    run_formatter: bool = True,
+    language: LanguagePair = JAVA_PYTHON,
+) -> Any:
+    """
+    Formats the code with the target language's formatter (Black for Python)
+    With `run_formatter=False` the code is saved as is, to be formatted later in a batch (see `formatting.format_files`)
+    """
+    code = store.get(state["code"])
 
-    mode = black.FileMode(string_normalization=False)
-    state["code"] = black.format_file_contents(state["code"], fast=False, mode=mode)
+    # Code that doesn't compile can't be formatted, it is saved as is
+    if run_formatter and state["error"]["status"] == 0:
+        print("[DEBUG] Formatting the code")
+        code = language.target.format(code)
+        state["code"] = store.put(code)
 
-    with open(save_file_path, "w") as fl:
-        fl.write(state["code"])
+    atomic_write(save_file_path, code)
 
     print(f"[DEBUG] Formatted code file saved to disk at: '{save_file_path}'")
     return state
 
 
-def step_generation_node(state: Any, model: Any, templates: Any):
+def step_generation_node(state: Any, model: Any, templates: Any, store: BlobStore):
     """Generates a step-by-step plan on how to transpile the original code file"""
     print("[DEBUG]: Generating a step-by-step plan...")
     messages = [
-        SystemMessage(content=templates["planning"].format(state["scratchpad"])),
-        HumanMessage(content=state["original_code"]),
+        SystemMessage(
+            content=templates["planning"].format(read_scratchpad(state, store))
+        ),
+        HumanMessage(content=store.get(state["original_code"])),
     ]
 
     # Get the output from model and clean it
     output = model.invoke(messages)
-    state["scratchpad"] = output.content
+    state["scratchpad"] = [store.put(output.content)]
 
     return state
 
 
-def search_node(state: Any, model: Any, templates: Any):
+def search_node(state: Any, model: Any, templates: Any, store: BlobStore):
     """Generates questions on how to tranliterate certain parts of the code then searches the internet for the context"""
     print("[DEBUG] Gathering more information...")
 
+    # Imported lazily, langchain_community is slow to import
+    from langchain_community.utilities import GoogleSerperAPIWrapper
+
     search = GoogleSerperAPIWrapper()
 
     # Get a list of questions
-    questions = generate_questions(model, state, templates["questions"])
+    questions = generate_questions(
+        model,
+        read_scratchpad(state, store),
+        store.get(state["original_code"]),
+        templates["questions"],
+    )
 
     # Simple question-answer pairs will just be added to the scratchpad
-    state["scratchpad"] += "Commong QnAs: \n"
+    state["scratchpad"].append(store.put("Commong QnAs: \n"))
 
     # Search answers for each question (currently only gets a simple answer)
     # TODO: Add URL recursive parsing for each answer
     for idx, question in enumerate(questions):
         ans = search.run(question)
-        state["scratchpad"] += f"{idx}." + question + ": " + ans + "\n"
+        state["scratchpad"].append(store.put(f"{idx}." + question + ": " + ans + "\n"))
 
     return state
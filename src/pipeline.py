@@ -0,0 +1,80 @@
+import os
+
+from typing import List, Optional, Tuple
+
+# Helpers to find and run the files to transpile, shared by the command line and the work queue.
+# Like the command line, this module only imports the graphs once a file is run.
+
+
+def success_record_path(target_file_path: str) -> str:
+    """Hidden file next to the output that holds the hash of the source it was successfully transpiled from"""
+    dir_name, name = os.path.split(target_file_path)
+    return os.path.join(dir_name, f".{name}.sha256")
+
+
+def record_result(
+    source_file_path: str,
+    target_file_path: str,
+    success: bool,
+    source_hash: Optional[str] = None,
+):
+    """
+    Records a successful run, failed attempts written with `--debug` are not treated as up to date
+    `source_hash` is the hash of the source that was transpiled, by default the current source file is hashed
+    """
+    from formatting import atomic_write, content_hash
+
+    record_path = success_record_path(target_file_path)
+    if success:
+        if source_hash is None:
+            with open(source_file_path, "r") as fl:
+                source_hash = content_hash(fl.read())
+        atomic_write(record_path, source_hash)
+    elif os.path.exists(record_path):
+        os.remove(record_path)
+
+
+def is_up_to_date(source_file_path: str, target_file_path: str) -> bool:
+    """A file is up to date if its output was successfully transpiled from the current source"""
+    from formatting import content_hash
+
+    record_path = success_record_path(target_file_path)
+    if not os.path.exists(target_file_path) or not os.path.exists(record_path):
+        return False
+
+    with open(record_path, "r") as fl:
+        recorded_hash = fl.read().strip()
+    with open(source_file_path, "r") as fl:
+        return content_hash(fl.read()) == recorded_hash
+
+
+def collect_jobs(
+    input_dir: str, output_dir: str, pair, force: bool = False
+) -> List[Tuple[str, str]]:
+    """Walks the input directory and returns (source, target) path pairs that need transpiling"""
+    jobs = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if not name.endswith(pair.source.extension):
+                continue
+
+            source_file_path = os.path.join(root, name)
+            # Keep the directory layout of the input tree in the output tree
+            rel_dir = os.path.relpath(root, input_dir)
+            target_file_path = pair.output_path(
+                source_file_path, os.path.normpath(os.path.join(output_dir, rel_dir))
+            )
+
+            if force or not is_up_to_date(source_file_path, target_file_path):
+                jobs.append((source_file_path, target_file_path))
+
+    return jobs
+
+
+def get_runner(graph: str):
+    """Imports the selected graph module and returns its `run` function"""
+    if graph == "simple":
+        from simple_transpile import run
+    else:
+        from complex_transpile import run
+    return run
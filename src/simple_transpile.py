@@ -1,51 +1,100 @@
-import os
+import sys
 from functools import partial
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langgraph.graph import StateGraph, END
 
-from typing import TypedDict, Any
+from typing import TypedDict, Any, List, Optional
 
-from utils import sanitize_output, python_compile
+from utils import (
+    load_model,
+    bind_strategy,
+    extract_chunk,
+    splice_chunk,
+)
+from conditions import DEFAULT_STRATEGIES, compile_time_error, progress_node
+from formatting import atomic_write
+from store import BlobStore
+from translation_memory import TranslationMemory
+from languages import LanguagePair, JAVA_PYTHON, get_language_pair
+from nodes import reuse_translation
 
-from dotenv import load_dotenv, find_dotenv
+# {source} and {target} are filled in with the names of the selected language pair
+EXAMPLES_TEMPLATE = "Following are verified translations of similar {source} code, reuse them where they apply:\n{}\n"
+
+SYSTEM_TEMPLATE = "You are an expert developer and you are tasked with transpiling code from {source} to {target}. Convert the given {source} code into {target} and make sure it's syntactically correct and does exactly what the {source} code is doing. Also, make sure that the generated {target} code follows best practices, is efficient, and uses standard libraries wherever possible. Don't generate any extra text, just the transpiled code.\n"
 
 
 class State(TypedDict):
+    # Both code fields only hold references into the `BlobStore`
     code: str
     original_code: str
     error: dict
     iterations: int
+    # Error signatures seen so far, the current repair strategy and why the graph stopped
+    error_history: List[str]
+    strategy: int
+    stop_reason: str
 
 
 def transpile_node(
     state: State,
     model: Any,
     system_template: str,
+    store: BlobStore,
+    strategies: List[dict] = DEFAULT_STRATEGIES,
+    examples: str = "",
+    language: LanguagePair = JAVA_PYTHON,
+    examples_template: str = EXAMPLES_TEMPLATE,
 ) -> State:
     """
     Transpile node
     This node both transpiles a code for the first time and optimises the code if it didn't work as intended or failed to compile
     """
+    original_code = store.get(state["original_code"])
+    code = store.get(state["code"])
+
+    # Verified translations of similar code from the translation memory
+    if examples:
+        system_template += examples_template.format(examples)
+
+    strategy = strategies[state["strategy"]]
+    model = bind_strategy(model, strategy)
+
+    # Chunked repair only sends (and replaces) the lines around a compile error
+    chunk = None
+    if (
+        "context_lines" in strategy
+        and state["error"]["status"] == 1
+        and state["error"].get("line")
+    ):
+        chunk = extract_chunk(code, state["error"]["line"], strategy["context_lines"])
+
     # If there is no error, add the initial prompt and run the transpilation
     if state["error"]["status"] == 0:
         messages = [
             SystemMessage(content=system_template),
-            HumanMessage(content=state["original_code"]),
+            HumanMessage(content=original_code),
         ]
 
     else:
         messages = [
             SystemMessage(content=system_template),
-            HumanMessage(content=state["original_code"]),
+            HumanMessage(content=original_code),
         ]
 
         # If there was an error choose the human message based on the error code
         # Codes - 0 (no error), 1 (error compiling), 2 (compiles but the outputs don't match)
-        error_messages = [AIMessage(content=state["code"])]
+        error_messages = [AIMessage(content=code)]
+        # Program did not compile, only the failing lines have to be fixed
+        if chunk is not None:
+            error_messages.append(
+                HumanMessage(
+                    content=f"Lines {chunk[0]} to {chunk[1]} of the transpiled code you returned did not compile successfully. Following is the stack trace: {state['error']['message']}. Here are those lines:\n{chunk[2]}\nFix the error and return only the fixed version of these lines, keeping their indentation. Don't generate any extra text, just the fixed lines.\n"
+                )
+            )
+
         # Program did not compile
-        if state["error"]["status"] == 1:
+        elif state["error"]["status"] == 1:
             error_messages.append(
                 HumanMessage(
                     content=f"The transpiled code you returned did not compile successfully. Following is the stack trace: {state['error']['message']}. Fix the error and return the working transpiled code. Don't generate any extra text, just the working transpiled code.\n"
@@ -70,60 +119,68 @@ def transpile_node(
 
     # Get the output from model and clean it
     output = model.invoke(messages)
-    output = sanitize_output(output.content)
+    if chunk is not None:
+        chunk_code = language.target.sanitize_chunk(output.content)
+        output = splice_chunk(code, chunk[0], chunk[1], chunk_code)
+    else:
+        output = language.target.sanitize(output.content)
 
-    state["code"] = output
+    state["code"] = store.put(output)
     state["iterations"] += 1
     return state
 
 
 def compile_node(
-    state: State, debug: bool = True, save_file_path: str = "dummy/test_file.py"
+    state: State,
+    store: BlobStore,
+    debug: bool = True,
+    save_file_path: str = "dummy/test_file.py",
+    language: LanguagePair = JAVA_PYTHON,
+    tests: Optional[str] = None,
 ):
     """
     Compilation Node
-    This node compiles transpiled code and if there were any errors during compilation it updates the state
+    This node validates transpiled code (and runs the tests, if any) and if there were any errors it updates the state
     """
-    code = state["code"]
-    state["error"] = python_compile(code, state["error"])
+    code = store.get(state["code"])
+    state["error"] = language.target.validate(code, state["error"])
+    if state["error"]["status"] == 0 and tests:
+        state["error"] = language.target.run_tests(code, tests, state["error"])
     if debug:
         # In debugging mode, save the file to the disk even with error
-        with open(f"{save_file_path}", "w") as fl:
-            print(f"[DEBUG] File saved to disk at: '{save_file_path}'")
-            fl.write(code)
+        atomic_write(save_file_path, code)
+        print(f"[DEBUG] File saved to disk at: '{save_file_path}'")
     else:
         if state["error"]["status"] == 0:
-            with open(f"{save_file_path}", "w") as fl:
-                fl.write(code)
+            atomic_write(save_file_path, code)
 
     return state
 
 
-def compile_time_error(state: State, max_iter: int = 3):
-    """If there was a compile time error, it takes the code back to transpile node"""
-    if state["error"]["status"] == 0 or state["iterations"] > max_iter:
-        return "terminate"
-    else:
-        return "continue"
-
-
-def init_graph(transpile_node_fn, compile_node_fn, compile_time_error_fn):
+def init_graph(
+    transpile_node_fn, compile_node_fn, progress_node_fn, compile_time_error_fn
+):
     """Initialises the graph"""
+    # langgraph is slow to import, only load it once a graph is actually built
+    from langgraph.graph import StateGraph, END
+
     graph = StateGraph(State)
 
     # Add all the nodes
     graph.add_node("transpile", transpile_node_fn)
     graph.add_node("compile", compile_node_fn)
+    graph.add_node("progress", progress_node_fn)
 
     # Set the entry point to be the transpile node
     graph.set_entry_point("transpile")
 
     # Add edge from transpile to compile node
     graph.add_edge("transpile", "compile")
+    graph.add_edge("compile", "progress")
 
-    # Add a conditional edge from compile to transpile if compilation failed
+    # Add a conditional edge back to transpile if compilation failed and the repairs are making progress
     graph.add_conditional_edges(
-        "compile",
+        "progress",
         compile_time_error_fn,
         {"terminate": END, "continue": "transpile"},
     )
@@ -131,56 +188,89 @@ def init_graph(transpile_node_fn, compile_node_fn, compile_time_error_fn):
     return graph
 
 
-if __name__ == "__main__":
-    # Load the env secrets
-    load_dotenv(find_dotenv())
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-    # Init the model and other parameters
-    model_name = "gpt-4o-mini"
-    is_debug = True
-    max_iter = 3
-
-    # Python file will have the same name as Java file but changed folder and extensions
-    java_file_path = "dummy/java/CandyLCHard.java"
-    python_file_path = os.path.join(
-        "dummy/python", os.path.basename(java_file_path).replace(".java", ".py")
-    )
-
-    SYSTEM_TEMPLATE = "You are an expert developer and you are tasked with transpiling code from Java to Python. Convert the given Java code into Python and make sure it's syntactically correct and does exactly what the Java code is doing. Also, make sure that the generated Python code follows best practices, is efficient, and uses standard libraries wherever possible. Don't generate any extra text, just the transpiled code.\n"
+def run(
+    source_file_path: str,
+    target_file_path: str,
+    model_name: str = "gpt-4o-mini",
+    max_iter: int = 3,
+    is_debug: bool = True,
+    store: Optional[BlobStore] = None,
+    memory: Optional[TranslationMemory] = None,
+    language: str = "java-python",
+    tests_path: Optional[str] = None,
+):
+    """Transpiles a single file (Java to Python by default) using the simple graph"""
+    pair = get_language_pair(language)
+    model = load_model(model_name, temperature=0.2)
+    store = store if store is not None else BlobStore()
 
-    model = ChatOpenAI(model=model_name, temperature=0.2, api_key=OPENAI_API_KEY)
+    # Read in the original code file, only its reference is kept in the state
+    with open(source_file_path, "r") as fl:
+        original_code = store.put(fl.read())
 
-    # Read in the original java code file
-    with open(java_file_path, "r") as fl:
-        java_code = fl.read()
+    tests = pair.read_tests(tests_path) if tests_path else None
 
     # Define an initial state
     state = State(
-        code="",
-        original_code=java_code,
+        code=store.put(""),
+        original_code=original_code,
         error={
             "status": 0,
             "message": "",
         },
         iterations=0,
+        error_history=[],
+        strategy=0,
+        stop_reason="",
     )
 
+    # An exact match in the translation memory is reused without running the graph
+    examples = ""
+    if memory is not None:
+        reused, examples = memory.suggest(store.get(original_code))
+        if reused is not None and reuse_translation(
+            state, reused, store, target_file_path, pair, tests, run_formatter=False
+        ):
+            return state
+
     # Define the partials for initialising the graph
     transpile_node_fn = partial(
-        transpile_node, model=model, system_template=SYSTEM_TEMPLATE
+        transpile_node,
+        model=model,
+        system_template=pair.render(SYSTEM_TEMPLATE),
+        store=store,
+        examples=examples,
+        language=pair,
+        examples_template=pair.render(EXAMPLES_TEMPLATE),
     )
 
     compile_node_fn = partial(
-        compile_node, debug=is_debug, save_file_path=python_file_path
+        compile_node,
+        store=store,
+        debug=is_debug,
+        save_file_path=target_file_path,
+        language=pair,
+        tests=tests,
     )
 
-    compile_time_error_fn = partial(compile_time_error, max_iter=max_iter)
+    progress_node_fn = partial(progress_node, max_iter=max_iter)
 
     # Init the graph and compile it
     graph = init_graph(
-        transpile_node_fn, compile_node_fn, compile_time_error_fn
+        transpile_node_fn, compile_node_fn, progress_node_fn, compile_time_error
     ).compile()
 
     # Run the graph
-    graph.invoke(state)
+    state = graph.invoke(state)
+
+    # Only code that compiled is added to the translation memory
+    if memory is not None and state["stop_reason"] == "success":
+        memory.record(store.get(state["original_code"]), store.get(state["code"]))
+
+    return state
+
+
+if __name__ == "__main__":
+    from cli import main
+
+    sys.exit(main(["simple", *sys.argv[1:]]))
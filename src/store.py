@@ -0,0 +1,63 @@
+import os
+import zlib
+import hashlib
+
+from typing import Iterable, Optional
+
+from formatting import atomic_write
+
+
+class BlobStore:
+    """
+    Content-addressed store for the large strings of a run (original code, code attempts, plans, search answers)
+    The graph state only keeps the references (sha256 hashes) returned by `put`, so identical blobs are stored once
+    Blobs are kept zlib-compressed in memory, or as files under `root` when it is given
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.blobs = {}
+
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        # Fan out into sub-folders so a single folder doesn't hold every blob
+        return os.path.join(self.root, ref[:2], ref[2:])
+
+    def put(self, text: str) -> str:
+        """Stores the text (if not already present) and returns its reference"""
+        data = text.encode("utf-8")
+        ref = hashlib.sha256(data).hexdigest()
+
+        if ref in self:
+            return ref
+
+        if self.root:
+            os.makedirs(os.path.dirname(self._path(ref)), exist_ok=True)
+            atomic_write(self._path(ref), text)
+        else:
+            self.blobs[ref] = zlib.compress(data)
+
+        return ref
+
+    def get(self, ref: str) -> str:
+        """Returns the text stored under the reference"""
+        if self.root:
+            with open(self._path(ref), "r") as fl:
+                return fl.read()
+        return zlib.decompress(self.blobs[ref]).decode("utf-8")
+
+    def join(self, refs: Iterable[str], sep: str = "") -> str:
+        """Returns the texts of several references joined together"""
+        return sep.join(self.get(ref) for ref in refs)
+
+    def __contains__(self, ref: str) -> bool:
+        if self.root:
+            return os.path.exists(self._path(ref))
+        return ref in self.blobs
+
+    def __len__(self) -> int:
+        if self.root:
+            return sum(len(files) for _, _, files in os.walk(self.root))
+        return len(self.blobs)
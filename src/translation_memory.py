@@ -0,0 +1,257 @@
+import zlib
+import sqlite3
+import hashlib
+
+from array import array
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from languages import JAVA_KEYWORDS, JAVA_PYTHON, LanguagePair, tokenize_java
+
+# MinHash parameters, BANDS * ROWS hashes per signature
+BANDS, ROWS = 8, 4
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_BUCKET_CANDIDATES = 50
+HASH_PARAMS = [
+    (
+        int.from_bytes(hashlib.sha1(f"a{i}".encode()).digest()[:4], "big") | 1,
+        int.from_bytes(hashlib.sha1(f"b{i}".encode()).digest()[:4], "big"),
+    )
+    for i in range(BANDS * ROWS)
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    language TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    java TEXT NOT NULL,
+    python TEXT NOT NULL,
+    signature BLOB,
+    UNIQUE (fingerprint, kind, language)
+);
+CREATE TABLE IF NOT EXISTS lsh (
+    band TEXT NOT NULL,
+    pair_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lsh_band ON lsh (band);
+"""
+
+
+def canonical_tokens(code: str) -> Tuple[List[str], List[str]]:
+    """
+    Normalizes Java code by renaming local identifiers to v0, v1, ... in order of first use
+    Keywords, types (capitalized names), members accessed with "." and literals are kept as is
+    Returns the canonical tokens and the original identifiers in renaming order
+    """
+    names = {}
+    canonical = []
+    prev = ""
+    for kind, text, _, _ in tokenize_java(code):
+        if (
+            kind == "name"
+            and text not in JAVA_KEYWORDS
+            and not text[0].isupper()
+            and prev != "."
+        ):
+            if text not in names:
+                names[text] = f"v{len(names)}"
+            text = names[text]
+        canonical.append(text)
+        prev = text
+    return canonical, list(names)
+
+
+def fingerprint(code: str) -> str:
+    """Fingerprint of Java code, two snippets that only differ in local names have the same fingerprint"""
+    canonical, _ = canonical_tokens(code)
+    return hashlib.sha1("\x00".join(canonical).encode("utf-8")).hexdigest()
+
+
+def shape_tokens(code: str) -> List[str]:
+    """Like `canonical_tokens` but also drops the names and literals, used for near matches"""
+    shape = []
+    for kind, text, _, _ in tokenize_java(code):
+        if kind == "string":
+            text = "S"
+        elif kind == "number":
+            text = "N"
+        elif kind == "name" and text not in JAVA_KEYWORDS and not text[0].isupper():
+            text = "v" if not shape or shape[-1] != "." else text
+        shape.append(text)
+    return shape
+
+
+def minhash(code: str) -> List[int]:
+    """MinHash signature of the 3-gram shingles of the code's shape"""
+    shape = shape_tokens(code)
+    shingles = {
+        zlib.crc32("\x00".join(shape[i : i + 3]).encode("utf-8"))
+        for i in range(max(1, len(shape) - 2))
+    }
+    return [min((a * x + b) % MERSENNE_PRIME for x in shingles) for a, b in HASH_PARAMS]
+
+
+def band_keys(signature: List[int], language: str = "java") -> List[str]:
+    return [
+        f"{language}:{band}:"
+        + ",".join(map(str, signature[band * ROWS : (band + 1) * ROWS]))
+        for band in range(BANDS)
+    ]
+
+
+def pair_methods(
+    java_code: str, python_code: str, pair: LanguagePair = JAVA_PYTHON
+) -> List[Tuple[str, str]]:
+    """Pairs every Java method with the Python function it was translated to (if it can be found)"""
+    functions = pair.target.split(python_code)
+    by_name = {}
+    for (_, name), func in functions.items():
+        by_name.setdefault(name, []).append(func)
+
+    pairs = []
+    for method in pair.source.split(java_code):
+        for name in pair.target.function_names(method["name"], method["class"]):
+            func = functions.get((method["class"], name)) or functions.get((None, name))
+            if func is None and len(by_name.get(name, [])) == 1:
+                func = by_name[name][0]
+            if func is not None:
+                pairs.append((method["code"], func))
+                break
+    return pairs
+
+
+class TranslationMemory:
+    """
+    Local index of verified translations (Java -> Python by default), stored in a SQLite file
+    Whole files and single methods are indexed by `fingerprint` for exact matches, methods are also
+    indexed by MinHash bands (LSH) to find near matches that are used as few-shot examples
+    Other C-like source languages can share the file, their entries are kept apart by `language`
+    """
+
+    def __init__(self, db_path: str, pair: LanguagePair = JAVA_PYTHON):
+        self.db_path = db_path
+        self.pair = pair
+        # Entries are scoped to the source language, the code is split and renamed with the language plugins
+        self.language = pair.source.key
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.executescript(SCHEMA)
+
+    def _add(self, kind: str, java_code: str, python_code: str):
+        signature = minhash(java_code) if kind == "method" else None
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO pairs (kind, language, fingerprint, java, python, signature)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                kind,
+                self.language,
+                fingerprint(java_code),
+                java_code,
+                python_code,
+                array("I", signature).tobytes() if signature else None,
+            ),
+        )
+        if signature and cursor.rowcount == 1:
+            self.conn.executemany(
+                "INSERT INTO lsh (band, pair_id) VALUES (?, ?)",
+                [
+                    (key, cursor.lastrowid)
+                    for key in band_keys(signature, self.language)
+                ],
+            )
+
+    def record(self, java_code: str, python_code: str) -> int:
+        """Adds a verified translation (the whole file and its methods), returns the number of method pairs"""
+        pairs = pair_methods(java_code, python_code, self.pair)
+        with self.conn:
+            self._add("file", java_code, python_code)
+            for java_method, python_function in pairs:
+                self._add("method", java_method, python_function)
+        return len(pairs)
+
+    def exact(self, java_code: str, kind: str = "method") -> Optional[str]:
+        """
+        Returns the stored translation of code with the same fingerprint, renamed to the new identifiers
+        Returns None if the translation can't be renamed safely (see `languages.rename_python_identifiers`)
+        """
+        row = self.conn.execute(
+            "SELECT java, python FROM pairs WHERE fingerprint = ? AND kind = ? AND language = ?",
+            (fingerprint(java_code), kind, self.language),
+        ).fetchone()
+        if row is None:
+            return None
+
+        # Same fingerprint, so the identifiers line up one to one
+        _, old_names = canonical_tokens(row[0])
+        _, new_names = canonical_tokens(java_code)
+        mapping = {old: new for old, new in zip(old_names, new_names) if old != new}
+        if not mapping:
+            return row[1]
+        target = self.pair.target
+        return target.rename(row[1], mapping, target.reserved)
+
+    def similar(
+        self, java_code: str, k: int = 3, min_similarity: float = 0.5
+    ) -> List[Tuple[float, str, str]]:
+        """Returns up to `k` (similarity, java, python) method pairs that look like the given code"""
+        signature = minhash(java_code)
+
+        # Only look at the first few pairs of each bucket, so crowded buckets stay cheap
+        counts = Counter()
+        for key in band_keys(signature, self.language):
+            counts.update(
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT pair_id FROM lsh WHERE band = ? LIMIT ?",
+                    (key, MAX_BUCKET_CANDIDATES),
+                )
+            )
+        candidates = counts.most_common(k * 10)
+
+        results = []
+        for pair_id, _ in candidates:
+            java, python, blob = self.conn.execute(
+                "SELECT java, python, signature FROM pairs WHERE id = ?", (pair_id,)
+            ).fetchone()
+            other = array("I", blob)
+            similarity = sum(a == b for a, b in zip(signature, other)) / len(signature)
+            if similarity >= min_similarity:
+                results.append((similarity, java, python))
+
+        results.sort(key=lambda r: r[0], reverse=True)
+        return results[:k]
+
+    def suggest(self, java_code: str, k: int = 3) -> Tuple[Optional[str], str]:
+        """
+        Looks up a whole file before it is transpiled
+        Returns the reused translation if the file is an exact match, otherwise None and the prompt text with
+        the verified translations of its methods (exact matches first, then near matches)
+        """
+        reused = self.exact(java_code, kind="file")
+        if reused is not None:
+            return reused, ""
+
+        exact, near = [], []
+        for method in self.pair.source.split(java_code):
+            python = self.exact(method["code"])
+            if python is not None:
+                exact.append((method["code"], python))
+            elif len(near) < k:
+                near.extend(
+                    (java, python)
+                    for _, java, python in self.similar(method["code"], k=1)
+                )
+
+        source, target = self.pair.source.name, self.pair.target.name
+        examples = [
+            f"{source}:\n{java}\n{target}:\n{python}\n"
+            for java, python in exact + near[:k]
+        ]
+        return None, "\n".join(examples)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
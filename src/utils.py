@@ -1,11 +1,11 @@
 import os
 import re
 import ast
+import sys
+import tempfile
 import subprocess
 
-from typing import Any, List
-
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from typing import Any, List, Tuple
 
 
 def python_compile(code: str, error: dict):
@@ -15,6 +15,7 @@ def python_compile(code: str, error: dict):
         ast.parse(code)
         error["status"] = 0
         error["message"] = ""
+        error["line"] = None
         return error
 
     except SyntaxError as e:
@@ -23,16 +24,43 @@ def python_compile(code: str, error: dict):
             f"SyntaxError: {str(e)}\n"
             f"Line {e.lineno}, Column {e.offset}\n"
             f"{e.text}\n"
-            f"{' ' * (e.offset - 1)}^"
+            f"{' ' * ((e.offset or 1) - 1)}^"
         )
+        error["line"] = e.lineno
         return error
 
     except Exception as e:
         error["status"] = 1
         error["message"] = f"Compilation Error: {str(e)}"
+        error["line"] = None
         return error
 
 
+def python_run_tests(code: str, tests: str, error: dict, timeout: float = 60):
+    """Runs the code followed by the tests (plain asserts) in a fresh interpreter"""
+    # Unlike validation this executes the generated code, so it is kept out of this process
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as fl:
+        fl.write(code + "\n\n" + tests)
+
+    try:
+        proc = subprocess.run(
+            [sys.executable, fl.name],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        failed, output = proc.returncode != 0, proc.stderr
+    except subprocess.TimeoutExpired:
+        failed, output = True, f"Tests timed out after {timeout} seconds"
+    finally:
+        os.remove(fl.name)
+
+    error["status"] = 2 if failed else 0
+    error["message"] = output if failed else ""
+    error["line"] = None
+    return error
+
+
 def java_compile(file: str):
     """Compiles Java code"""
     try:
@@ -46,15 +74,59 @@ def java_compile(file: str):
     return (0, "")
 
 
-def sanitize_output(code: str):
-    """Sanitizes the output returned by the model"""
-    markdown_pattern = r"^\s*```python\s*([\s\S]*)\s*```\s*$"
+def load_model(model_name: str, temperature: float = 0.2):
+    """Loads the env secrets and initialises the chat model"""
+    # Both are imported here so that the CLI can start without them
+    from dotenv import load_dotenv, find_dotenv
+    from langchain_openai import ChatOpenAI
+
+    load_dotenv(find_dotenv())
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+    return ChatOpenAI(model=model_name, temperature=temperature, api_key=OPENAI_API_KEY)
+
+
+def bind_strategy(model: Any, strategy: dict) -> Any:
+    """Binds the model and temperature overrides of a repair strategy to the chat model"""
+    overrides = {k: strategy[k] for k in ("model", "temperature") if k in strategy}
+    return model.bind(**overrides) if overrides else model
+
+
+def extract_chunk(code: str, line: int, context_lines: int) -> Tuple[int, int, str]:
+    """Returns the (1-indexed, inclusive) start and end lines and the text of the lines around `line`"""
+    lines = code.split("\n")
+    start = max(1, line - context_lines)
+    end = min(len(lines), line + context_lines)
+    return start, end, "\n".join(lines[start - 1 : end])
+
+
+def splice_chunk(code: str, start: int, end: int, chunk: str) -> str:
+    """Replaces the lines `start` to `end` (1-indexed, inclusive) of the code with the chunk"""
+    lines = code.split("\n")
+    return "\n".join(lines[: start - 1] + chunk.split("\n") + lines[end:])
+
+
+def sanitize_chunk(text: str, fence: str = "python") -> str:
+    """Sanitizes a repaired chunk returned by the model, keeping the indentation of its lines"""
+    block = re.search(rf"```(?:{fence})?[^\n]*\n([\s\S]*?)```", text)
+    if block:
+        text = block.group(1)
+
+    lines = text.rstrip().split("\n")
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def sanitize_output(code: str, fence: str = "python"):
+    """Sanitizes the output returned by the model, `fence` is the language tag of its markdown code blocks"""
+    markdown_pattern = rf"^\s*```{fence}\s*([\s\S]*)\s*```\s*$"
     markdown_match = re.match(markdown_pattern, code, re.MULTILINE)
 
     if markdown_match:
         return markdown_match.group(1).strip()
 
-    code_blocks = re.findall(r"```python\s*([\s\S]*?)\s*```", code, re.MULTILINE)
+    code_blocks = re.findall(rf"```{fence}\s*([\s\S]*?)\s*```", code, re.MULTILINE)
 
     if code_blocks:
         return "\n\n".join(block.strip() for block in code_blocks)
@@ -69,11 +141,16 @@ def sanitize_output(code: str):
     return "\n".join(code_lines)
 
 
-def generate_questions(model: Any, state: Any, template: str) -> List:
-    """Generates questions about a code file given a model, state and template"""
+def generate_questions(
+    model: Any, scratchpad: str, original_code: str, template: str
+) -> List:
+    """Generates questions about a code file given a model, the scratchpad, the original code and a template"""
+    # Imported here so that the validators in this file can be used without langchain
+    from langchain_core.messages import HumanMessage, SystemMessage
+
     messages = [
-        SystemMessage(content=template.format(state["scratchpad"])),
-        HumanMessage(content=state["original_code"]),
+        SystemMessage(content=template.format(scratchpad)),
+        HumanMessage(content=original_code),
     ]
 
     # Generate questions
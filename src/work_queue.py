@@ -0,0 +1,482 @@
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional
+
+from formatting import content_hash
+
+# Job statuses
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source_file_path TEXT NOT NULL,
+    target_file_path TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    source TEXT NOT NULL,
+    language TEXT NOT NULL,
+    graph TEXT NOT NULL,
+    max_iter INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    output_hash TEXT,
+    iterations INTEGER,
+    error_status INTEGER,
+    error TEXT,
+    stop_reason TEXT,
+    output TEXT,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+def job_id_for(
+    source_hash: str, language: str, graph: str, max_iter: int, target_file_path: str
+):
+    """The same source transpiled the same way to the same place is always the same job"""
+    key = f"{source_hash}:{language}:{graph}:{max_iter}:{target_file_path}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue(ABC):
+    """
+    Interface the coordinator and the workers use to talk to the queue
+    Jobs carry the source code and results carry the transpiled code, so workers never touch the
+    coordinator's files. Workers lease a job for `lease_seconds` and keep it with `heartbeat`, a job
+    whose lease runs out is handed to another worker, and a job that fails `max_attempts` times is
+    marked as failed. Implement this on top of a real broker to run workers on several machines.
+    """
+
+    @abstractmethod
+    def enqueue(
+        self,
+        source_file_path: str,
+        target_file_path: str,
+        graph: str = "simple",
+        max_iter: int = 3,
+        max_attempts: int = 3,
+        language: str = "java-python",
+        force: bool = False,
+    ) -> Optional[str]:
+        """
+        Adds a job for the file and returns its id, or None if the job is already queued or done
+        A job that failed, or finished without success, is queued again (any finished job with `force`)
+        """
+
+    @abstractmethod
+    def lease(self, worker_id: str) -> Optional[dict]:
+        """Leases the next pending (or expired) job to the worker, returns None if there is nothing to do"""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease of a running job, returns False if the worker lost the lease"""
+
+    @abstractmethod
+    def complete(self, job: dict, worker_id: str, result: dict) -> bool:
+        """Records the result of a job, returns False if the worker no longer holds the lease"""
+
+    @abstractmethod
+    def fail(self, job: dict, worker_id: str, error: str):
+        """Puts the job back in the queue, or marks it as failed once it used all its attempts"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Returns the number of jobs in each status"""
+
+    @abstractmethod
+    def results(self) -> List[dict]:
+        """Returns the finished jobs with their `source_file_path`, `target_file_path`, `source_hash`, `stop_reason` and `output`"""
+
+    def close(self):
+        pass
+
+
+class WorkQueue(JobQueue):
+    """
+    Job queue backed by a SQLite file, for running several workers on a single host
+    SQLite locking (and WAL mode in particular) doesn't work over network file systems, so the file must
+    not be shared between machines. Results are keyed by job, so the first result written wins.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 600):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+
+        # Transactions are handled explicitly, see `_transaction`. The heartbeat thread of a
+        # worker uses the connection while the worker waits for its job, never at the same time
+        self.conn = sqlite3.connect(
+            db_path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock straight away, so two workers can't lease the same job
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(
+        self,
+        source_file_path: str,
+        target_file_path: str,
+        graph: str = "simple",
+        max_iter: int = 3,
+        max_attempts: int = 3,
+        language: str = "java-python",
+        force: bool = False,
+    ) -> Optional[str]:
+        with open(source_file_path, "r") as fl:
+            source = fl.read()
+        source_hash = content_hash(source)
+
+        job_id = job_id_for(source_hash, language, graph, max_iter, target_file_path)
+        self._transaction()
+        try:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, source_file_path, target_file_path, source_hash,"
+                " source, language, graph, max_iter, status, max_attempts, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    source_file_path,
+                    target_file_path,
+                    source_hash,
+                    source,
+                    language,
+                    graph,
+                    max_iter,
+                    PENDING,
+                    max_attempts,
+                    time.time(),
+                ),
+            )
+            queued = cursor.rowcount == 1 or self._requeue(job_id, max_attempts, force)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return job_id if queued else None
+
+    def _requeue(self, job_id: str, max_attempts: int, force: bool) -> bool:
+        """Puts an existing job back in the queue if it should run again, called inside a transaction"""
+        # Pending and leased jobs will run anyway, finished jobs only run again if they didn't succeed
+        row = self.conn.execute(
+            "SELECT jobs.status, results.stop_reason FROM jobs"
+            " LEFT JOIN results ON results.job_id = jobs.id WHERE jobs.id = ?",
+            (job_id,),
+        ).fetchone()
+        retry = row["status"] == FAILED or (
+            row["status"] == DONE and (force or row["stop_reason"] != "success")
+        )
+        if not retry:
+            return False
+
+        # The old result is dropped, so the next result can be recorded
+        self.conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, attempts = 0, max_attempts = ?, lease_owner = NULL,"
+            " lease_expires = NULL, error = NULL, updated_at = ? WHERE id = ?",
+            (PENDING, max_attempts, time.time(), job_id),
+        )
+        return True
+
+    def lease(self, worker_id: str) -> Optional[dict]:
+        """Leases the next pending (or expired) job to the worker, returns None if there is nothing to do"""
+        now = time.time()
+        self._transaction()
+        try:
+            # Expired leases that have used up all their attempts won't be retried
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, error = 'lease expired', updated_at = ?"
+                " WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                (FAILED, now, LEASED, now),
+            )
+
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?)"
+                " ORDER BY updated_at LIMIT 1",
+                (PENDING, LEASED, now),
+            ).fetchone()
+
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        # The row was read before the update, apply the lease to the returned copy
+        job = dict(row)
+        job.update(
+            status=LEASED,
+            lease_owner=worker_id,
+            lease_expires=now + self.lease_seconds,
+            attempts=row["attempts"] + 1,
+        )
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease of a running job, returns False if the worker lost the lease"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (time.time() + self.lease_seconds, job_id, worker_id, LEASED),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: dict, worker_id: str, result: dict) -> bool:
+        """
+        Records the result of a job, returns False if the worker no longer holds the lease
+        If the job already has a result this is a no-op
+        """
+        self._transaction()
+        try:
+            # A worker whose lease was taken over doesn't get to finish the job
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL,"
+                " error = NULL, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                (DONE, time.time(), job["id"], worker_id, LEASED),
+            )
+            if cursor.rowcount == 0:
+                self.conn.execute("ROLLBACK")
+                return False
+
+            self.conn.execute(
+                "INSERT OR IGNORE INTO results (job_id, worker_id, source_hash, output_hash,"
+                " iterations, error_status, error, stop_reason, output, finished_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["id"],
+                    worker_id,
+                    job["source_hash"],
+                    result.get("output_hash"),
+                    result.get("iterations"),
+                    result.get("error_status"),
+                    result.get("error"),
+                    result.get("stop_reason"),
+                    result.get("output"),
+                    time.time(),
+                ),
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return True
+
+    def fail(self, job: dict, worker_id: str, error: str):
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,"
+            " lease_owner = NULL, lease_expires = NULL, error = ?, updated_at = ?"
+            " WHERE id = ? AND lease_owner = ? AND status = ?",
+            (FAILED, PENDING, error, time.time(), job["id"], worker_id, LEASED),
+        )
+
+    def stats(self) -> dict:
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+        ):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def results(self) -> List[dict]:
+        rows = self.conn.execute(
+            "SELECT jobs.id, jobs.source_file_path, jobs.target_file_path, jobs.source_hash,"
+            " results.stop_reason, results.output FROM results"
+            " JOIN jobs ON jobs.id = results.job_id ORDER BY results.finished_at"
+        )
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def transpile_job(
+    job: dict, model_name: str = "gpt-4o-mini", memory_path: Optional[str] = None
+) -> dict:
+    """
+    Default job handler, runs the selected graph on the job's source code
+    The run happens in a temporary folder and the transpiled code is returned in the result,
+    the coordinator writes it to the target path (see `cli.py collect`)
+    """
+    from pipeline import get_runner
+    from languages import get_language_pair
+
+    run = get_runner(job["graph"])
+    pair = get_language_pair(job["language"])
+    memory = None
+    if memory_path:
+        from translation_memory import TranslationMemory
+
+        memory = TranslationMemory(memory_path, pair)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_file_path = os.path.join(
+            tmp_dir, os.path.basename(job["source_file_path"])
+        )
+        with open(source_file_path, "w") as fl:
+            fl.write(job["source"])
+        target_file_path = pair.output_path(source_file_path, tmp_dir)
+
+        try:
+            state = run(
+                source_file_path,
+                target_file_path,
+                model_name=model_name,
+                max_iter=job["max_iter"],
+                is_debug=False,
+                memory=memory,
+                language=job["language"],
+            )
+        finally:
+            if memory is not None:
+                memory.close()
+
+        output = None
+        if os.path.exists(target_file_path):
+            with open(target_file_path, "r") as fl:
+                output = fl.read()
+
+    # There is no batch formatting stage on the coordinator, so the worker formats the code
+    if output is not None and state["stop_reason"] == "success":
+        output = pair.target.format(output)
+
+    return {
+        "output": output,
+        "output_hash": content_hash(output) if output is not None else None,
+        "iterations": state["iterations"],
+        "error_status": state["error"]["status"],
+        "error": state["error"]["message"],
+        "stop_reason": state["stop_reason"],
+    }
+
+
+def keep_lease(queue: JobQueue, job_id: str, worker_id: str, interval: float):
+    """Starts a thread that renews the lease every `interval` seconds, returns the event that stops it"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            if not queue.heartbeat(job_id, worker_id):
+                print(f"[DEBUG] {worker_id} lost the lease of job {job_id[:12]}")
+                break
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    return stop, thread
+
+
+def run_worker(
+    db_path: str,
+    worker_id: Optional[str] = None,
+    handler: Callable[[dict], dict] = transpile_job,
+    lease_seconds: float = 600,
+    poll_interval: float = 1.0,
+    stop_when_empty: bool = True,
+    queue_factory: Callable[..., JobQueue] = WorkQueue,
+) -> int:
+    """
+    Leases jobs from the queue and runs them until the queue is empty (or forever with `stop_when_empty=False`)
+    The lease is renewed in the background while the handler runs. Returns the number of jobs the worker completed
+    """
+    worker_id = worker_id or default_worker_id()
+    queue = queue_factory(db_path, lease_seconds=lease_seconds)
+
+    n_done = 0
+    try:
+        while True:
+            job = queue.lease(worker_id)
+            if job is None:
+                if stop_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            print(
+                f"[DEBUG] {worker_id} running job {job['id'][:12]} ({job['source_file_path']})"
+            )
+            stop, thread = keep_lease(queue, job["id"], worker_id, lease_seconds / 3)
+            error = None
+            try:
+                result = handler(job)
+            except Exception as e:
+                error = e
+            finally:
+                # The heartbeat is stopped before the queue is used again, so only one thread uses it at a time
+                stop.set()
+                thread.join()
+
+            if error is not None:
+                print(f"[DEBUG] {worker_id} job {job['id'][:12]} failed: {error}")
+                queue.fail(job, worker_id, f"{type(error).__name__}: {error}")
+                continue
+
+            if queue.complete(job, worker_id, result):
+                n_done += 1
+            else:
+                print(f"[DEBUG] {worker_id} dropped the result of job {job['id'][:12]}")
+    finally:
+        queue.close()
+
+    return n_done
+
+
+def _worker_process(args: tuple) -> int:
+    # Top level so it can be pickled by multiprocessing
+    db_path, worker_id, handler, lease_seconds, stop_when_empty = args
+    return run_worker(
+        db_path, worker_id, handler, lease_seconds, stop_when_empty=stop_when_empty
+    )
+
+
+def run_workers(
+    db_path: str,
+    n_workers: int,
+    handler: Callable[[dict], Any] = transpile_job,
+    lease_seconds: float = 600,
+    stop_when_empty: bool = True,
+) -> int:
+    """Runs `n_workers` worker processes on this machine until the queue is empty (or forever)"""
+    from multiprocessing import Pool
+
+    worker_ids = [f"{default_worker_id()}:{idx}" for idx in range(n_workers)]
+    with Pool(n_workers) as pool:
+        done = pool.map(
+            _worker_process,
+            [
+                (db_path, worker_id, handler, lease_seconds, stop_when_empty)
+                for worker_id in worker_ids
+            ],
+        )
+    return sum(done)
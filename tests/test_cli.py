@@ -0,0 +1,28 @@
+import pytest
+
+from cli import main
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["simple", "Main.py", "--dry-run"], "is not a Java file"),
+        (["complex", "Main.java", "--language", "go-python"], "Unknown language pair"),
+        (["batch", "src", "-o", "out", "--language", "go-python"], "Unknown language"),
+    ],
+)
+def test_usage_errors(capsys, argv, message):
+    # Reported by argparse (exit code 2) instead of a traceback
+    with pytest.raises(SystemExit) as exc:
+        main(argv)
+
+    assert exc.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+def test_dry_run(capsys, tmp_path):
+    source_file_path = tmp_path / "Main.java"
+    source_file_path.write_text("class Main {}\n")
+
+    assert main(["simple", str(source_file_path), "--dry-run"]) == 0
+    assert capsys.readouterr().out == f"{source_file_path} -> {tmp_path / 'Main.py'}\n"
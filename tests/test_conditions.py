@@ -0,0 +1,147 @@
+import pytest
+
+from conditions import (
+    DEFAULT_STRATEGIES,
+    compile_time_error,
+    detect_stall,
+    error_signature,
+    progress_node,
+)
+
+TRACEBACK = """Traceback (most recent call last):
+  File "/tmp/tmpabc.py", line {line}, in <module>
+    assert {test}
+AssertionError: {message}
+"""
+
+
+def syntax_error(line=3, column=5, message="invalid syntax"):
+    return {
+        "status": 1,
+        "message": f"SyntaxError: {message}\nLine {line}, Column {column}\n",
+        "line": line,
+    }
+
+
+def failed_test(line=10, test="f(1) == 2", message="f(1)"):
+    return {
+        "status": 2,
+        "message": TRACEBACK.format(line=line, test=test, message=message),
+        "line": None,
+    }
+
+
+def make_state(**kwargs):
+    state = {
+        "error": syntax_error(),
+        "iterations": 0,
+        "error_history": [],
+        "strategy": 0,
+        "stop_reason": "",
+    }
+    state.update(kwargs)
+    return state
+
+
+def test_error_signature_ignores_columns():
+    assert error_signature(syntax_error(column=5)) == error_signature(
+        syntax_error(column=9)
+    )
+    assert error_signature(syntax_error(line=3)) != error_signature(
+        syntax_error(line=4)
+    )
+
+
+def test_error_signature_uses_the_exception_of_test_failures():
+    # Every traceback starts with the same line, the exception tells the failures apart
+    first = failed_test(test="f(1) == 2", message="f(1)")
+    other = failed_test(test="g() == []", message="g()")
+
+    assert error_signature(first) != error_signature(other)
+    assert error_signature(first) == error_signature(failed_test(line=12))
+
+
+def test_error_signature_empty_message():
+    assert error_signature({"status": 2, "message": ""}) == error_signature(
+        {"status": 2, "message": "\n"}
+    )
+
+
+@pytest.mark.parametrize(
+    "history, stall",
+    [
+        ([], ""),
+        (["a"], ""),
+        (["a", "b"], ""),
+        (["a", "a"], "repeat"),
+        (["a", "b", "a"], "oscillation"),
+        (["a", "b", "c"], ""),
+    ],
+)
+def test_detect_stall(history, stall):
+    assert detect_stall(history) == stall
+
+
+def test_progress_node_success():
+    state = progress_node(make_state(error={"status": 0, "message": ""}, iterations=1))
+
+    assert state["stop_reason"] == "success"
+    assert compile_time_error(state) == "terminate"
+
+
+def test_progress_node_continues_while_errors_change():
+    state = make_state()
+    for line in (1, 2, 3):
+        state["error"] = syntax_error(line=line)
+        state["iterations"] += 1
+        state = progress_node(state, max_iter=5)
+
+    assert state["stop_reason"] == ""
+    assert state["strategy"] == 0
+    assert compile_time_error(state) == "continue"
+
+
+def run_constant_error(max_iter):
+    """Returns the strategies used when every call fails with the same error, and the stop reason"""
+    state = make_state()
+    used = []
+    while not state["stop_reason"]:
+        used.append(DEFAULT_STRATEGIES[state["strategy"]]["name"])
+        state["iterations"] += 1
+        state = progress_node(state, max_iter=max_iter)
+    return used, state["stop_reason"]
+
+
+def test_escalation_fits_the_default_budget():
+    used, stop_reason = run_constant_error(max_iter=3)
+
+    assert used == ["default", "default", "bigger_model"]
+    assert stop_reason == "max_iter"
+
+
+def test_escalation_uses_every_strategy_then_stops_early():
+    used, stop_reason = run_constant_error(max_iter=10)
+
+    assert used == ["default", "default", "temperature", "chunked", "bigger_model"]
+    assert stop_reason == "repeat"
+
+
+def test_oscillation_stops_with_the_last_strategy():
+    state = make_state(strategy=len(DEFAULT_STRATEGIES) - 1)
+    for line in (1, 2, 1):
+        state["error"] = syntax_error(line=line)
+        state["iterations"] += 1
+        state = progress_node(state, max_iter=10)
+
+    assert state["stop_reason"] == "oscillation"
+
+
+def test_repeated_test_failures_are_progress_when_they_differ():
+    state = make_state()
+    for test in ("f(1) == 2", "g() == []", "h(2) == 4"):
+        state["error"] = failed_test(test=test, message=test.split(" ")[0])
+        state["iterations"] += 1
+        state = progress_node(state, max_iter=5)
+
+    assert state["strategy"] == 0
+    assert state["stop_reason"] == ""
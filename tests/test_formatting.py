@@ -0,0 +1,69 @@
+import json
+import os
+import stat
+
+from formatting import atomic_write, content_hash, format_code, format_files
+
+
+def write(path, code):
+    path.write_text(code)
+    return str(path)
+
+
+def test_format_code():
+    assert format_code("x=1\n") == "x = 1\n"
+
+
+def test_format_code_already_formatted():
+    # Black raises NothingChanged for formatted code, the code is returned as is
+    assert format_code("x = 1\n") == "x = 1\n"
+
+
+def test_atomic_write_keeps_permissions(tmp_path):
+    path = write(tmp_path / "out.py", "old\n")
+    os.chmod(path, 0o640)
+
+    atomic_write(path, "new\n")
+
+    assert open(path).read() == "new\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert os.listdir(tmp_path) == ["out.py"]
+
+
+def test_format_files(tmp_path):
+    paths = [
+        write(tmp_path / "a.py", "x=1\n"),
+        write(tmp_path / "b.py", "x = 1\n"),
+    ]
+
+    stats = format_files(paths, max_workers=1)
+
+    assert stats == {"formatted": 1, "unchanged": 1, "skipped": 0, "failed": 0}
+    assert open(paths[0]).read() == "x = 1\n"
+
+
+def test_format_files_skips_cached(tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    paths = [write(tmp_path / "a.py", "x=1\n"), write(tmp_path / "b.py", "y=2\n")]
+    format_files(paths, max_workers=1, cache_path=cache_path)
+
+    # Only the edited file is formatted again
+    write(tmp_path / "b.py", "y=3\n")
+    stats = format_files(paths, max_workers=1, cache_path=cache_path)
+
+    assert stats == {"formatted": 1, "unchanged": 0, "skipped": 1, "failed": 0}
+    with open(cache_path) as fl:
+        assert content_hash("y = 3\n") in json.load(fl)
+
+
+def test_format_files_reports_failed_files(tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    paths = [write(tmp_path / "a.py", "x=1\n"), write(tmp_path / "b.py", "def f(:\n")]
+
+    stats = format_files(paths, max_workers=1, cache_path=cache_path)
+
+    assert stats == {"formatted": 1, "unchanged": 0, "skipped": 0, "failed": 1}
+    assert open(paths[1]).read() == "def f(:\n"
+    # Files that failed are not cached, so they are tried again next time
+    with open(cache_path) as fl:
+        assert json.load(fl) == [content_hash("x = 1\n")]
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from languages import (
+    JAVA_PYTHON,
+    KOTLIN_PYTHON,
+    get_language_pair,
+    split_java_methods,
+    split_kotlin_functions,
+    split_python_functions,
+)
+
+JAVA_CODE = """
+public class Shop {
+    private int total;
+
+    public Shop(int total) {
+        this.total = total;
+    }
+
+    // A call followed by a block is not a declaration
+    public List<Integer> prices(int n) throws IOException {
+        if (n > 0) {
+            return new ArrayList<>(n);
+        }
+        Runnable r = new Runnable() {
+            public void run() {}
+        };
+        return null;
+    }
+
+    static class Item {
+        int price() { return 1; }
+    }
+}
+"""
+
+KOTLIN_CODE = """
+class Shop(val total: Int) {
+    fun prices(n: Int): List<Int> {
+        return List(n) { it }
+    }
+
+    fun double(x: Int) = x * 2
+
+    private fun <T> List<T>.second(): T {
+        return this[1]
+    }
+}
+
+fun main() {
+    println(Shop(1).prices(2))
+}
+"""
+
+
+def test_split_java_methods():
+    methods = split_java_methods(JAVA_CODE)
+
+    assert [(m["class"], m["name"]) for m in methods] == [
+        ("Shop", "Shop"),
+        ("Shop", "prices"),
+        ("Item", "price"),
+    ]
+    # Modifiers are part of the method, the anonymous class stays inside it
+    assert methods[1]["code"].startswith("public List<Integer> prices(int n)")
+    assert "public void run()" in methods[1]["code"]
+
+
+def test_split_kotlin_functions():
+    functions = split_kotlin_functions(KOTLIN_CODE)
+
+    # Expression bodies are left out
+    assert [(f["class"], f["name"]) for f in functions] == [
+        ("Shop", "prices"),
+        ("Shop", "second"),
+        (None, "main"),
+    ]
+    assert functions[1]["code"].strip().startswith("private fun <T> List<T>.second()")
+
+
+def test_split_python_functions():
+    functions = split_python_functions(
+        "def main():\n    pass\n\nclass Shop:\n    @property\n    def total(self):\n        return 1\n"
+    )
+
+    assert list(functions) == [(None, "main"), ("Shop", "total")]
+    assert functions[("Shop", "total")].startswith("@property\ndef total(self):")
+
+
+def test_output_path():
+    assert JAVA_PYTHON.output_path("src/Shop.java", "out") == os.path.join(
+        "out", "Shop.py"
+    )
+    assert KOTLIN_PYTHON.output_path("Shop.kt", "") == "Shop.py"
+
+    with pytest.raises(ValueError, match="not a Java file"):
+        JAVA_PYTHON.output_path("src/Shop.kt", "out")
+
+
+def test_get_language_pair():
+    assert get_language_pair() is JAVA_PYTHON
+    assert get_language_pair("kotlin-python") is KOTLIN_PYTHON
+
+    with pytest.raises(ValueError, match="Unknown language pair 'go-python'"):
+        get_language_pair("go-python")
+
+
+def test_render():
+    pair = get_language_pair("csharp-python")
+
+    # Only the language placeholders are filled in, the rest is left for str.format
+    assert pair.render("From {source} to {target}: {}") == "From C# to Python: {}"
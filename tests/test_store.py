@@ -0,0 +1,44 @@
+import pytest
+
+from store import BlobStore
+
+
+@pytest.fixture(params=["memory", "disk"])
+def store(request, tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs") if request.param == "disk" else None)
+
+
+def test_round_trip(store):
+    ref = store.put("class Main {}\n")
+
+    assert ref in store
+    assert store.get(ref) == "class Main {}\n"
+
+
+def test_identical_blobs_are_stored_once(store):
+    first = store.put("x = 1\n")
+    second = store.put("x = 1\n")
+    other = store.put("x = 2\n")
+
+    assert first == second != other
+    assert len(store) == 2
+
+
+def test_join(store):
+    refs = [store.put("plan\n"), store.put("answer\n"), store.put("plan\n")]
+
+    assert store.join(refs) == "plan\nanswer\nplan\n"
+    assert store.join(refs[:2], sep="---\n") == "plan\n---\nanswer\n"
+
+
+def test_unicode(store):
+    ref = store.put("print('héllo ✓')\n")
+
+    assert store.get(ref) == "print('héllo ✓')\n"
+
+
+def test_disk_store_is_shared(tmp_path):
+    root = str(tmp_path / "blobs")
+    ref = BlobStore(root=root).put("shared\n")
+
+    assert BlobStore(root=root).get(ref) == "shared\n"
@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from translation_memory import TranslationMemory, fingerprint, pair_methods
+
+DUMMY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dummy")
+
+
+def read_pair(name):
+    with open(os.path.join(DUMMY_DIR, "java", f"{name}.java")) as fl:
+        java_code = fl.read()
+    with open(os.path.join(DUMMY_DIR, "python", f"{name}.py")) as fl:
+        python_code = fl.read()
+    return java_code, python_code
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    yield memory
+    memory.close()
+
+
+def test_pair_methods():
+    pairs = pair_methods(*read_pair("CandyLCHard"))
+
+    assert len(pairs) == 2
+    assert pairs[0][0].startswith("public int count(int n)")
+    assert pairs[0][1].startswith("def count(self, n):")
+    assert pairs[1][0].startswith("public int candy(int[] ratings)")
+    assert pairs[1][1].startswith("def candy(self, ratings):")
+
+
+def test_pair_methods_matches_snake_case_and_constructors():
+    pairs = dict(pair_methods(*read_pair("LibraryManagementSystem")))
+    java_methods = {
+        java.split("(")[0].split()[-1]: python for java, python in pairs.items()
+    }
+
+    assert java_methods["checkOutBook"].startswith("def check_out_book(")
+    assert java_methods["Library"].startswith("def __init__(")
+    # Getters that became plain attributes have no Python function
+    assert "getTitle" not in java_methods
+
+
+def test_exact_renames_identifiers(memory):
+    java_code, python_code = read_pair("CandyLCHard")
+    memory.record(java_code, python_code)
+
+    assert memory.exact(java_code, kind="file") == python_code
+
+    renamed = memory.exact(java_code.replace("candies", "total"), kind="file")
+    assert renamed == python_code.replace("candies", "total")
+
+    # camelCase names are also renamed in their snake_case form
+    renamed = memory.exact(java_code.replace("oldSlope", "prevSlope"), kind="file")
+    assert "prevSlope" in renamed and "oldSlope" not in renamed
+
+
+# A local that shares its name with a keyword argument of the Python code
+PRINT_PAIR = (
+    """public class Printer {
+    public void print(int end) {
+        System.out.print(end);
+    }
+}
+""",
+    """class Printer:
+    def print(self, end):
+        print(end, end="")
+""",
+)
+
+
+@pytest.mark.parametrize(
+    "pair, old, new",
+    [
+        (read_pair("CandyLCHard"), "candies", "len"),  # builtin used by the stored code
+        (read_pair("CandyLCHard"), "candies", "lambda"),  # Python keyword
+        # Collides with a name only the Python code uses
+        (read_pair("CandyLCHard"), "candies", "self"),
+        # The method is called as self.count(...)
+        (read_pair("CandyLCHard"), "count", "tally"),
+        # The name is also a keyword argument, print(end="") must not become print(stop="")
+        (PRINT_PAIR, "end", "stop"),
+    ],
+)
+def test_exact_refuses_unsafe_renames(memory, pair, old, new):
+    java_code, python_code = pair
+    memory.record(java_code, python_code)
+
+    # Same fingerprint, but the stored code can't be renamed safely
+    assert fingerprint(java_code.replace(old, new)) == fingerprint(java_code)
+    assert memory.exact(java_code.replace(old, new), kind="file") is None
+    reused, _ = memory.suggest(java_code.replace(old, new))
+    assert reused is None
+
+
+def test_exact_miss(memory):
+    java_code, python_code = read_pair("CandyLCHard")
+    memory.record(java_code, python_code)
+
+    assert memory.exact(java_code.replace("+ 1;", "+ 2;"), kind="file") is None
+
+
+def test_similar_finds_near_matches(memory):
+    memory.record(*read_pair("LibraryManagementSystem"))
+    java_code, python_code = read_pair("CandyLCHard")
+    memory.record(java_code, python_code)
+
+    # The candy method with an extra statement
+    candy = java_code[java_code.index("public int candy(") : java_code.rindex("}")]
+    query = candy.replace(
+        "oldSlope = newSlope;", "oldSlope = newSlope;\nSystem.out.println(candies);"
+    )
+    assert memory.exact(query) is None
+
+    results = memory.similar(query)
+    assert results
+    similarity, java, python = results[0]
+    assert 0.5 <= similarity < 1
+    assert java.startswith("public int candy(")
+    assert python.startswith("def candy(")
+
+
+def test_suggest_adds_examples(memory):
+    java_code, python_code = read_pair("CandyLCHard")
+    memory.record(java_code, python_code)
+
+    # A different file that contains one of the recorded methods
+    query = "class Other {\n    public int count(int k) {\n        return (k * (k + 1)) / 2;\n    }\n}"
+    reused, examples = memory.suggest(query)
+
+    assert reused is None
+    assert examples.startswith("Java:\n")
+    assert "def count(self, k):" in examples
@@ -0,0 +1,164 @@
+import time
+
+import pytest
+
+from work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue, run_worker
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "Main.java"
+    path.write_text("class Main {}\n")
+    return str(path)
+
+
+def make_queue(tmp_path, lease_seconds=600):
+    return WorkQueue(str(tmp_path / "queue.db"), lease_seconds=lease_seconds)
+
+
+def n_results(queue):
+    return queue.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def test_enqueue_is_idempotent(tmp_path, source_file):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue(source_file, str(tmp_path / "Main.py"))
+
+    assert job_id is not None
+    assert queue.enqueue(source_file, str(tmp_path / "Main.py")) is None
+    assert queue.stats()[PENDING] == 1
+
+
+@pytest.mark.parametrize(
+    "stop_reason, force, requeued",
+    [
+        ("success", False, False),
+        ("success", True, True),
+        ("max_iter", False, True),
+        ("repeat", False, True),
+    ],
+)
+def test_enqueue_requeues_unsuccessful_jobs(
+    tmp_path, source_file, stop_reason, force, requeued
+):
+    queue = make_queue(tmp_path)
+    target_file_path = str(tmp_path / "Main.py")
+    queue.enqueue(source_file, target_file_path)
+    queue.complete(queue.lease("a"), "a", {"stop_reason": stop_reason})
+
+    job_id = queue.enqueue(source_file, target_file_path, force=force)
+
+    assert (job_id is not None) == requeued
+    assert queue.stats()[PENDING if requeued else DONE] == 1
+    assert n_results(queue) == (0 if requeued else 1)
+    if requeued:
+        assert queue.lease("b")["attempts"] == 1
+
+
+def test_enqueue_requeues_failed_jobs(tmp_path, source_file):
+    queue = make_queue(tmp_path)
+    target_file_path = str(tmp_path / "Main.py")
+    queue.enqueue(source_file, target_file_path, max_attempts=1)
+    queue.fail(queue.lease("a"), "a", "boom")
+    assert queue.stats()[FAILED] == 1
+
+    assert queue.enqueue(source_file, target_file_path, max_attempts=1) is not None
+    assert queue.lease("b") is not None
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path, source_file):
+    queue = make_queue(tmp_path, lease_seconds=0.2)
+    job_id = queue.enqueue(source_file, str(tmp_path / "Main.py"))
+
+    job = queue.lease("a")
+    assert job["id"] == job_id
+    assert job["lease_owner"] == "a"
+    assert queue.lease("b") is None
+
+    time.sleep(0.3)
+    job = queue.lease("b")
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+    assert not queue.heartbeat(job_id, "a")
+
+
+def test_expired_lease_counts_as_attempt(tmp_path, source_file):
+    queue = make_queue(tmp_path, lease_seconds=0.1)
+    queue.enqueue(source_file, str(tmp_path / "Main.py"), max_attempts=2)
+
+    for worker_id in ("a", "b"):
+        assert queue.lease(worker_id) is not None
+        time.sleep(0.2)
+
+    assert queue.lease("c") is None
+    assert queue.stats()[FAILED] == 1
+
+
+def test_fail_retries_until_max_attempts(tmp_path, source_file):
+    queue = make_queue(tmp_path)
+    queue.enqueue(source_file, str(tmp_path / "Main.py"), max_attempts=2)
+
+    queue.fail(queue.lease("a"), "a", "boom")
+    assert queue.stats()[PENDING] == 1
+
+    queue.fail(queue.lease("a"), "a", "boom")
+    assert queue.stats()[FAILED] == 1
+    assert queue.lease("a") is None
+
+
+def test_first_result_wins(tmp_path, source_file):
+    queue = make_queue(tmp_path, lease_seconds=0.1)
+    queue.enqueue(source_file, str(tmp_path / "Main.py"))
+
+    stale = queue.lease("a")
+    time.sleep(0.2)
+    job = queue.lease("b")
+
+    assert queue.complete(job, "b", {"stop_reason": "success"})
+    # The worker that lost the lease and a repeated completion are both ignored
+    assert not queue.complete(stale, "a", {"stop_reason": "max_iter"})
+    assert not queue.complete(job, "b", {"stop_reason": "success"})
+
+    assert queue.stats()[DONE] == 1
+    assert n_results(queue) == 1
+    row = queue.conn.execute("SELECT worker_id, stop_reason FROM results").fetchone()
+    assert tuple(row) == ("b", "success")
+
+
+def test_worker_keeps_the_lease_of_a_long_job(tmp_path, source_file):
+    db_path = str(tmp_path / "queue.db")
+    queue = WorkQueue(db_path, lease_seconds=0.3)
+    queue.enqueue(source_file, str(tmp_path / "Main.py"))
+
+    def slow_job(job):
+        time.sleep(1)
+        other = WorkQueue(db_path, lease_seconds=0.3)
+        leased = other.lease("other")
+        other.close()
+        assert leased is None
+        return {"stop_reason": "success"}
+
+    assert run_worker(db_path, "a", slow_job, lease_seconds=0.3) == 1
+    assert queue.stats() == {PENDING: 0, LEASED: 0, DONE: 1, FAILED: 0}
+
+
+def test_collect_writes_results(tmp_path, source_file):
+    from cli import main
+    from pipeline import is_up_to_date
+
+    db_path = str(tmp_path / "queue.db")
+    target_file_path = str(tmp_path / "out" / "Main.py")
+    queue = WorkQueue(db_path)
+    queue.enqueue(source_file, target_file_path)
+    job = queue.lease("a")
+
+    # Workers only get the source through the job
+    assert job["source"] == "class Main {}\n"
+    queue.complete(
+        job, "a", {"stop_reason": "success", "output": "class Main:\n    pass\n"}
+    )
+    queue.close()
+
+    assert main(["collect", "--queue", db_path]) == 0
+    assert open(target_file_path).read() == "class Main:\n    pass\n"
+    assert is_up_to_date(source_file, target_file_path)